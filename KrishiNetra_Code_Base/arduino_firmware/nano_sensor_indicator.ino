@@ -23,6 +23,7 @@ DHT dht(DHT_PIN, DHTTYPE);
 
 // --- GLOBAL VARIABLES ---
 String command;
+const int SERVO_SETTLE_MS = 100; // Hold time after a tilt so the camera has stopped shaking.
 
 // =======================================================================================
 //   SETUP
@@ -57,7 +58,12 @@ void loop() {
 // =======================================================================================
 void processCommand(String& cmd) {
   if (cmd.startsWith("PAN:")) handleSmoothServo(cmd, servoPan);
-  else if (cmd.startsWith("TILT:")) handleSmoothServo(cmd, servoTilt);
+  else if (cmd.startsWith("TILT:")) {
+    handleSmoothServo(cmd, servoTilt);
+    // Tells the Pi the camera is in position, so it can capture without a fixed wait.
+    delay(SERVO_SETTLE_MS);
+    Serial.println("<DONE:TILT>");
+  }
   else if (cmd.startsWith("PIPE:")) handleSmoothServo(cmd, servoPipe);
   else if (cmd == "PIPE_EXTEND") handlePipeExtend();
   else if (cmd.startsWith("INDICATE:")) handleIndication(cmd);
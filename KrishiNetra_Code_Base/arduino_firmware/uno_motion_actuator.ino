@@ -36,6 +36,12 @@ String command;
 volatile int hall_count = 0;
 unsigned long last_hall_trigger_time = 0; // For debouncing the hall sensor
 
+// --- Targeted Move (MOVE:<left>:<right>:TARGET:<pulses>) ---
+const unsigned long MOVE_TIMEOUT_MS = 20000;
+bool move_active = false;
+int move_target_pulses = 0;
+unsigned long move_start_time = 0;
+
 NewPing sonarFront(FRONT_TRIG_PIN, FRONT_ECHO_PIN, 400); // Max distance 400 cm
 NewPing sonarSide(SIDE_TRIG_PIN, SIDE_ECHO_PIN, 400);
 
@@ -60,6 +66,7 @@ void setup() {
 //   MAIN LOOP - COMMAND-DRIVEN
 // =======================================================================================
 void loop() {
+  if (move_active) checkMoveTarget();
   if (Serial.available() > 0) {
     String commandWithBrackets = Serial.readStringUntil('>');
     if (commandWithBrackets.startsWith("<")) {
@@ -75,8 +82,15 @@ void processCommand(String& cmd) {
   if (cmd.startsWith("MOVE:")) {
     int firstColon = cmd.indexOf(':');
     int secondColon = cmd.indexOf(':', firstColon + 1);
+    int thirdColon = cmd.indexOf(':', secondColon + 1);
     int left = cmd.substring(firstColon + 1, secondColon).toInt();
-    int right = cmd.substring(secondColon + 1).toInt();
+    int right = cmd.substring(secondColon + 1, thirdColon == -1 ? cmd.length() : thirdColon).toInt();
+    // Optional target: stop on our own and report <DONE:MOVE:...> instead of being polled.
+    move_active = thirdColon != -1 && cmd.substring(thirdColon + 1).startsWith("TARGET:");
+    if (move_active) {
+      move_target_pulses = cmd.substring(cmd.lastIndexOf(':') + 1).toInt();
+      move_start_time = millis();
+    }
     moveMotors(left, right);
     Serial.println("<ACK:MOVE_OK>");
   } else if (cmd.startsWith("SPRAY:")) {
@@ -100,6 +114,7 @@ void processCommand(String& cmd) {
         Serial.println("<ACK:PUMP_OK>");
     }
   } else if (cmd == "STOP") {
+    move_active = false;
     stopAll();
     Serial.println("<ACK:STOP_OK>");
   } else if (cmd == "RESET_ENCODER") {
@@ -151,6 +166,17 @@ void moveMotors(int leftSpeed, int rightSpeed) {
   analogWrite(RIGHT_EN, abs(rightSpeed));
 }
 
+void checkMoveTarget() {
+  noInterrupts();
+  int pulses = hall_count;
+  interrupts();
+  bool reached = pulses >= move_target_pulses;
+  if (!reached && millis() - move_start_time < MOVE_TIMEOUT_MS) return;
+  moveMotors(0, 0);
+  move_active = false;
+  Serial.println(reached ? "<DONE:MOVE:OK>" : "<DONE:MOVE:TIMEOUT>");
+}
+
 void stopAll() {
   moveMotors(0, 0);
   digitalWrite(RELAY_1_PESTICIDE_1, HIGH);
@@ -1,7 +1,9 @@
 # config.py
 
 import os
-from typing import List, Dict, Any, Tuple
+from pathlib import Path
+from types import MappingProxyType
+from typing import List, Any, Tuple, FrozenSet, Mapping
 
 # ==============================================================================
 # --- PROJECT & UI CONFIGURATION ---
@@ -12,14 +14,20 @@ LOG_LEVEL: str = "INFO"
 # ==============================================================================
 # --- FILE SYSTEM & DATABASE PATHS ---
 # ==============================================================================
-PROJECT_ROOT: str = os.path.dirname(os.path.abspath(__file__))
-DATA_PATH: str = os.path.join(PROJECT_ROOT, "data")
-LOG_PATH: str = os.path.join(DATA_PATH, "logs")
-CAPTURED_IMAGES_DATA_PATH: str = os.path.join(PROJECT_ROOT, "web_interface", "static", "captured_images")
-DATABASE_PATH: str = os.path.join(DATA_PATH, "mission_log.db")
+# Paths are composed once from a resolved Path and exported as plain strings.
+_ROOT: Path = Path(__file__).resolve().parent
+_DATA: Path = _ROOT / "data"
+_LOGS: Path = _DATA / "logs"
 
-LOG_FILE_PATH: str = os.path.join(LOG_PATH, "robot.log")
-ERROR_LOG_FILE_PATH: str = os.path.join(LOG_PATH, "error.log")
+PROJECT_ROOT: str = str(_ROOT)
+DATA_PATH: str = str(_DATA)
+LOG_PATH: str = str(_LOGS)
+CAPTURED_IMAGES_DATA_PATH: str = str(_ROOT / "web_interface" / "static" / "captured_images")
+# In WAL mode SQLite keeps "-wal" and "-shm" files next to the database; copy all three together.
+DATABASE_PATH: str = str(_DATA / "mission_log.db")
+
+LOG_FILE_PATH: str = str(_LOGS / "robot.log")
+ERROR_LOG_FILE_PATH: str = str(_LOGS / "error.log")
 
 # ==============================================================================
 # --- SERIAL COMMUNICATION WITH ARDUINOS ---
@@ -28,14 +36,36 @@ UNO_SERIAL_PORT: str = '/dev/arduinoUNO'
 NANO_SERIAL_PORT: str = '/dev/arduinoNANO'
 SERIAL_BAUD_RATE: int = 115200
 SERIAL_CONNECT_TIMEOUT_S: float = 3.0
+# The serial reader threads share core 0 with the camera and web threads, away from inference.
+SERIAL_READER_CPU_CORES: FrozenSet[int] = frozenset({0})
 
 # ==============================================================================
 # --- INFERENCE & AI MODELS ---
 # ==============================================================================
-MODEL_WEIGHTS_PATH: str = os.path.join(PROJECT_ROOT, "inference", "weights")
-STRESS_DETECTOR_MODEL_PATH: str = os.path.join(MODEL_WEIGHTS_PATH, "stress_detector.onnx")
+_WEIGHTS: Path = _ROOT / "inference" / "weights"
+MODEL_WEIGHTS_PATH: str = str(_WEIGHTS)
+_STRESS_FP32: Path = _WEIGHTS / "stress_detector.onnx"
+_STRESS_INT8: Path = _WEIGHTS / "stress_detector_int8.onnx"
+STRESS_DETECTOR_FP32_MODEL_PATH: str = str(_STRESS_FP32)
+STRESS_DETECTOR_INT8_MODEL_PATH: str = str(_STRESS_INT8)
+# The INT8 build (python -m inference.quantize_model) is preferred when it has been generated.
+_STRESS_ONNX: Path = _STRESS_INT8 if _STRESS_INT8.exists() else _STRESS_FP32
+# An ORT-format copy loads without a protobuf parse. Build it on the Pi itself, so it matches the
+# installed onnxruntime and CPU:
+#   python -m onnxruntime.tools.convert_onnx_models_to_ort <model>.onnx --optimization_style Fixed
+# It is only used while it is at least as new as the .onnx it was converted from.
+_STRESS_ORT: Path = _STRESS_ONNX.with_suffix(".ort")
+_USE_STRESS_ORT: bool = _STRESS_ORT.exists() and (
+    not _STRESS_ONNX.exists() or _STRESS_ORT.stat().st_mtime >= _STRESS_ONNX.stat().st_mtime
+)
+STRESS_DETECTOR_MODEL_PATH: str = str(_STRESS_ORT if _USE_STRESS_ORT else _STRESS_ONNX)
 INFERENCE_CONFIDENCE_THRESHOLD: float = 0.55
 STRESS_MODEL_INPUT_SIZE: Tuple[int, int] = (448, 448)
+# ONNX Runtime intra-op threads; one of the Pi's four cores is left for the camera, serial and web threads.
+ORT_INTRA_THREADS: int = 3
+# Cores the inference worker thread is pinned to; core 0 is left for the camera, serial and web threads.
+# Keep this disjoint from SERIAL_READER_CPU_CORES.
+INFERENCE_CPU_CORES: FrozenSet[int] = frozenset({1, 2, 3})
 
 STRESS_CLASS_NAMES: List[str] = [
     "Fungal_Blight", "Rust_Mildew", "Bacterial_Blight_Spot", "Viral_Curl_Mosaic",
@@ -51,6 +81,7 @@ MANUAL_DEFAULT_SPEED: int = 200
 MANUAL_TURN_SPEED: int = 180
 WHEEL_CIRCUMFERENCE_CM: float = 22.0
 ENCODER_PULSES_PER_ROTATION: int = 20
+MOVE_TIMEOUT_S: float = 20.0  # Must match MOVE_TIMEOUT_MS in the Uno firmware.
 SIDE_US_END_OF_ROW_THRESHOLD_CM: float = 30.0
 NO_DETECTION_END_OF_ROW_CONSECUTIVE: int = 3
 
@@ -61,50 +92,66 @@ ML_PER_SECOND: float = 5.0
 HIGH_HUMIDITY_THRESHOLD: int = 85
 HIGH_TEMP_THRESHOLD: float = 35.0
 
-TANK_MAP: Dict[int, str] = {
+# Shared lookup tables are read-only views (MappingProxyType), so any thread
+# can hold a reference to them without taking a defensive copy.
+TANK_MAP: Mapping[int, str] = MappingProxyType({
     1: "Pesticide 1",
     2: "Pesticide 2",
     3: "Water",
-}
+})
+
+PESTICIDE_GROUP_1: Mapping[str, Any] = MappingProxyType({"name": "Fungal Disease Control", "tank": 1, "targets": ("Fungal_Blight", "Rust_Mildew", "Leaf_Spot", "Rust_Scab_Rot")})
+PESTICIDE_GROUP_2: Mapping[str, Any] = MappingProxyType({"name": "Bacterial & Pest Control", "tank": 2, "targets": ("Bacterial_Blight_Spot", "Viral_Curl_Mosaic", "Pest_Damage", "Wilt_Rot")})
+FERTILIZER_GROUP: Mapping[str, Any] = MappingProxyType({"name": "Nutrient & Growth Support", "tank": 3, "targets": ("Nutrient_Deficiency", "Discoloration_Stress", "Physiological_Stress")})
+TREATMENT_GROUPS: Tuple[Mapping[str, Any], ...] = (PESTICIDE_GROUP_1, PESTICIDE_GROUP_2, FERTILIZER_GROUP)
+HEALTHY_CLASSES: FrozenSet[str] = frozenset({"Healthy"})
 
-PESTICIDE_GROUP_1: Dict[str, Any] = {"name": "Fungal Disease Control", "tank": 1, "targets": ["Fungal_Blight", "Rust_Mildew", "Leaf_Spot", "Rust_Scab_Rot"]}
-PESTICIDE_GROUP_2: Dict[str, Any] = {"name": "Bacterial & Pest Control", "tank": 2, "targets": ["Bacterial_Blight_Spot", "Viral_Curl_Mosaic", "Pest_Damage", "Wilt_Rot"]}
-FERTILIZER_GROUP: Dict[str, Any] = {"name": "Nutrient & Growth Support", "tank": 3, "targets": ["Nutrient_Deficiency", "Discoloration_Stress", "Physiological_Stress"]}
-TREATMENT_GROUPS: List[Dict] = [PESTICIDE_GROUP_1, PESTICIDE_GROUP_2, FERTILIZER_GROUP]
-HEALTHY_CLASSES: List[str] = ["Healthy"]
+# Inverted lookups built once at import so per-detection checks are O(1).
+STRESS_TO_TREATMENT_GROUP: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+    cls: group for group in TREATMENT_GROUPS for cls in group["targets"]
+})
 
-DISEASE_COLOR_MAP: Dict[str, str] = {
+DISEASE_COLOR_MAP: Mapping[str, str] = MappingProxyType({
     "Healthy": "#4CAF50", "Fungal_Blight": "#E53935", "Rust_Mildew": "#EF5350",
     "Leaf_Spot": "#F44336", "Rust_Scab_Rot": "#D32F2F", "Pest_Damage": "#FDD835",
     "Bacterial_Blight_Spot": "#FFC107", "Viral_Curl_Mosaic": "#8E24AA", "Wilt_Rot": "#9C27B0",
     "Nutrient_Deficiency": "#1E88E5", "Discoloration_Stress": "#2196F3", "Physiological_Stress": "#42A5F5",
     "Default": "#9E9E9E",
-}
+})
 
 # ==============================================================================
 # --- WEB INTERFACE & SECURITY ---
 # ==============================================================================
 WEB_SERVER_HOST: str = "0.0.0.0"
 WEB_SERVER_PORT: int = 5000
+# Waitress worker threads. Each keeps its own SQLite connection (see database_manager),
+# and the dashboard's pollers hold HTTP/1.1 keep-alive connections, so this stays fixed and small.
+WEB_SERVER_THREADS: int = 8
+# Saved detection images are never rewritten (their file names carry a timestamp),
+# so the browser may reuse them without revalidating for this long.
+CAPTURED_IMAGE_MAX_AGE_S: int = 7 * 24 * 3600
 WEB_INTERFACE_PASSWORD: str = os.environ.get("ROBOT_PASSWORD", "krishinetra123")
-WEB_ALLOWED_COMMANDS: List[str] = [
+WEB_ALLOWED_COMMANDS: FrozenSet[str] = frozenset({
     "save_mission", "start_mission", "stop_mission", "pause", "resume",
     "emergency_stop", "set_manual_mode", "go_to_wizard",
-]
+})
 
 # ==============================================================================
 # --- ROBOT BEHAVIOR & STATE MACHINE ---
 # ==============================================================================
-CAMERA_ANGLES: Dict[str, int] = {
+CAMERA_ANGLES: Mapping[str, int] = MappingProxyType({
     "pan_straight": 90,
     "pan_left": 150,
     "tilt_top": 75,
     "tilt_middle": 90,
     "tilt_bottom": 120,
-}
+})
 CAMERA_SETTLE_TIME_S: float = 0.5
+TILT_DONE_TIMEOUT_S: float = 4.0  # A full 180 degree sweep at 15 ms/degree plus the Nano's settle hold.
+SCAN_IMAGE_JPEG_QUALITY: int = 75  # Live dashboard preview only; saved detection images keep the higher quality below.
+DETECTION_IMAGE_JPEG_QUALITY: int = 85
 YOLO_PRE_PROCESSING_DELAY_S: float = 1.0
-YOLO_POST_PROCESSING_DELAY_S: float = 1.5
+SESSION_PLANT_LOG_MAX_ENTRIES: int = 500
 
 def validate_paths() -> None:
     for path in [LOG_PATH, CAPTURED_IMAGES_DATA_PATH]:
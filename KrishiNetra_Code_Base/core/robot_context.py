@@ -1,12 +1,20 @@
 # core/robot_context.py
 
+import logging
 import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, replace
 from enum import Enum, auto
+import cv2
 import numpy as np
-from typing import Optional, Dict, Any, List
+import orjson
+from typing import Optional, Dict, Any, Tuple, Deque
 import datetime
 import config
 
+logger = logging.getLogger(__name__)
+
 class RobotState(Enum):
     """Enumeration for the Krishinetra robot's mission-based states."""
     OFF = auto()
@@ -22,32 +30,98 @@ class RobotState(Enum):
     ERROR = auto()
     SHUTDOWN = auto()
 
+@dataclass(frozen=True, slots=True)
+class RowPlan:
+    """Typed view of one row of the mission map."""
+    num_plants: int = 1
+    spacing_cm: float = 0.0
+    total_length_cm: Optional[float] = None  # None: find the row end by sensor (continuous mode).
+
+@dataclass(frozen=True, slots=True)
+class MissionPlan:
+    """Typed view of the mission plan submitted by the web UI, converted once when it is saved."""
+    layout_mode: Optional[str]
+    operation_mode: Optional[str]
+    rows: Tuple[RowPlan, ...]
+    scan_step_cm: float = 0.0
+
+    @classmethod
+    def from_dict(cls, plan: Dict[str, Any]) -> "MissionPlan":
+        """Raises ValueError or TypeError if a numeric field cannot be converted."""
+        rows = []
+        for row in plan.get("map") or ():
+            total_length_cm = row.get("total_length_cm")
+            rows.append(RowPlan(
+                num_plants=int(row.get("num_plants", 1)),
+                spacing_cm=float(row.get("spacing_cm", 0.0)),
+                total_length_cm=float(total_length_cm)
+                if isinstance(total_length_cm, (int, float)) and total_length_cm > 0 else None,
+            ))
+        return cls(
+            layout_mode=plan.get("layoutMode"),
+            operation_mode=plan.get("operationMode"),
+            rows=tuple(rows),
+            scan_step_cm=float(plan.get("scan_step_cm", 0.0)),
+        )
+
+@dataclass(frozen=True, slots=True)
+class MissionProgress:
+    """
+    Progress through the current mission. Frozen, so updates swap in a new instance
+    (copy-on-write); orjson serializes it for the UI with these field names as keys.
+    """
+    current_row_index: int = 0
+    current_plant_index: int = 0
+    total_distance_in_row_cm: float = 0.0
+    start_time: Optional[str] = None
+    plants_treated: int = 0
+    plants_scanned: int = 0
+    consecutive_empty_scans: int = 0
+
 class RobotContext:
     """A thread-safe class that holds the complete state of the Krishinetra robot."""
 
+    # A single long-lived instance read from several threads; slots avoid a per-instance __dict__.
+    __slots__ = (
+        "_lock",
+        "_current_state", "_current_state_name", "_is_running", "_is_paused", "_previous_state_before_pause",
+        "_mission_id", "_mission_plan", "_mission_plan_view", "_mission_progress", "_mission_message",
+        "_session_detection_tally", "_session_plant_log", "_latest_scan_images", "_scan_image_seq",
+        "_last_sensor_data",
+        "_manual_command", "_web_command", "_emergency_stop_activated",
+        "_manual_command_pending", "_web_command_pending", "_wakeup",
+        "_version", "_cached_snapshot", "_cached_json",
+    )
+
     def __init__(self):
-        self._lock = threading.RLock()
+        self._lock = threading.Lock()
 
         # --- Core State Machine ---
         self._current_state: RobotState = RobotState.OFF
+        self._current_state_name: str = self._current_state.name  # Kept in sync with _current_state.
         self._is_running: bool = False
         self._is_paused: bool = False
         self._previous_state_before_pause: RobotState = RobotState.IDLE
 
         # --- Mission Management ---
         self._mission_id: Optional[str] = None
-        self._mission_plan: Dict[str, Any] = {}
-        self._mission_progress: Dict[str, Any] = {}
+        self._mission_plan: Dict[str, Any] = {}  # As submitted, for the UI.
+        self._mission_plan_view: Optional[MissionPlan] = None  # Typed, for the controller.
+        self._mission_progress: Optional[MissionProgress] = None
         self._mission_message: str = "Welcome to KrishiNetra! Please start a new mission."
 
         # --- Live Session Data for Dashboard ---
-        self._session_detection_tally: Dict[str, int] = {}
-        self._session_plant_log: List[Dict[str, Any]] = []
-        self._latest_scan_images: Dict[str, Optional[np.ndarray]] = {
+        self._session_detection_tally: Counter = Counter()
+        # Newest entry first; bounded so long missions don't grow memory without limit.
+        self._session_plant_log: Deque[Dict[str, Any]] = deque(maxlen=config.SESSION_PLANT_LOG_MAX_ENTRIES)
+        # Stored as (etag, encoded JPEG bytes): the web UI is the only consumer and serves them as-is.
+        self._latest_scan_images: Dict[str, Optional[Tuple[str, bytes]]] = {
             "top": None,
             "middle": None,
             "bottom": None,
         }
+        # Seeded from the clock so an ETag cached by a browser before a restart can never match.
+        self._scan_image_seq: int = time.time_ns()
 
         # --- Hardware & Sensor Data ---
         self._last_sensor_data: Dict[str, Any] = {
@@ -57,92 +131,147 @@ class RobotContext:
         # --- Manual Control & Web Commands ---
         self._manual_command: Dict[str, Any] = {}
         self._web_command: Optional[Dict] = None
+        # Flags set by the producers so the idle polling loop can skip the lock entirely.
+        self._manual_command_pending: bool = False
+        self._web_command_pending: bool = False
         self._emergency_stop_activated: bool = False
+        # Set whenever new work arrives so the control loop can sleep until then.
+        self._wakeup = threading.Event()
 
-    def _sanitize_for_json(self, data: Any) -> Any:
-        if isinstance(data, dict):
-            return {k: self._sanitize_for_json(v) for k, v in data.items()}
-        if isinstance(data, list):
-            return [self._sanitize_for_json(i) for i in data]
-        if isinstance(data, np.integer):
-            return int(data)
-        if isinstance(data, np.floating):
-            return float(data)
-        return data
+        # The plan, progress, tally and sensor data are copy-on-write: mutators swap in a
+        # new object instead of editing in place, so readers can hold the reference without copying.
 
-    def get_all_data_for_ui(self) -> Dict[str, Any]:
+        # --- UI Snapshot Cache ---
+        # Every mutator of UI-visible state bumps _version; the snapshot is rebuilt only when it advances.
+        self._version: int = 0
+        self._cached_snapshot: Tuple[Optional[Dict[str, Any]], int] = (None, -1)
+        self._cached_json: Tuple[Optional[bytes], int] = (None, -1)
+
+    def _get_snapshot(self) -> Tuple[Dict[str, Any], int]:
+        """Returns the cached (snapshot, version) pair, rebuilding it if the state has changed."""
         with self._lock:
+            if self._cached_snapshot[1] == self._version:
+                return self._cached_snapshot
             ui_data = {
                 "server_status": "connected",
-                "robot_status": self._current_state.name,
+                "robot_status": self._current_state_name,
                 "is_paused": self._is_paused,
                 "mission_id": self._mission_id,
-                "mission_plan": self._mission_plan.copy(),
-                "mission_progress": self._mission_progress.copy(),
-                "last_sensor_data": self._last_sensor_data.copy(),
+                "mission_plan": self._mission_plan,
+                "mission_progress": self._mission_progress,
+                "last_sensor_data": self._last_sensor_data,
                 "mission_message": self._mission_message,
-                "session_tally": self._session_detection_tally.copy(),
-                "plant_log": self._session_plant_log.copy(),
+                "session_tally": self._session_detection_tally,
+                "plant_log": list(self._session_plant_log),
             }
-            return self._sanitize_for_json(ui_data)
+            self._cached_snapshot = (ui_data, self._version)
+            return self._cached_snapshot
+
+    def get_all_data_for_ui(self) -> Dict[str, Any]:
+        """Returns a shared, read-only snapshot of the UI-visible state. Callers must not mutate it."""
+        return self._get_snapshot()[0]
+
+    def get_ui_json(self) -> bytes:
+        """
+        Serializes the UI snapshot once per state version, outside the lock;
+        orjson converts numpy scalars natively.
+        """
+        ui_data, version = self._get_snapshot()
+        cached_json, cached_version = self._cached_json
+        if cached_version == version:
+            return cached_json
+        payload = orjson.dumps(ui_data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        self._cached_json = (payload, version)
+        return payload
 
     def save_mission_plan(self, plan: Dict[str, Any]):
-        """Saves a new mission plan, generates an ID, and resets session data."""
+        """
+        Saves a new mission plan, generates an ID, and resets session data.
+        Raises ValueError or TypeError, leaving the current plan untouched, if the plan is malformed.
+        """
+        plan_view = MissionPlan.from_dict(plan)
+        # All string formatting happens before taking the lock. The seconds-since-midnight
+        # suffix keeps IDs unique across restarts on the same day.
         now = datetime.datetime.now()
+        mission_num_today = now.hour * 3600 + now.minute * 60 + now.second
+        mission_id = f"KR-MSN-{now.date().isoformat()}-{mission_num_today:04d}"
+        start_time = now.isoformat()
         with self._lock:
             self._mission_plan = plan
-            mission_num_today = (now - now.replace(hour=0, minute=0, second=0, microsecond=0)).seconds
-            self._mission_id = f"KR-MSN-{now.strftime('%Y-%m-%d')}-{mission_num_today:04d}"
-
-            self._mission_progress = {
-                "current_row_index": 0,
-                "current_plant_index": 0,
-                "total_distance_in_row_cm": 0.0,
-                "start_time": now.isoformat(),
-                "plants_treated": 0,
-                "consecutive_empty_scans": 0,
-            }
+            self._mission_plan_view = plan_view
+            self._mission_id = mission_id
+
+            self._mission_progress = MissionProgress(start_time=start_time)
 
-            self._session_detection_tally = {}
-            self._session_plant_log = []
+            self._session_detection_tally = Counter()
+            self._session_plant_log.clear()
             self._latest_scan_images = {"top": None, "middle": None, "bottom": None}
             
             self._mission_message = "Mission plan saved. Ready to start."
             self._current_state = RobotState.MISSION_AWAITING_START
+            self._current_state_name = self._current_state.name
+            self._version += 1
+
+    # Single-attribute getters below read without the lock: loading one reference is
+    # atomic under the GIL, and the values read are immutable or copy-on-write.
 
     def get_mission_id(self) -> Optional[str]:
-        with self._lock:
-            return self._mission_id
+        return self._mission_id
+
+    def get_mission_plan(self) -> Optional[MissionPlan]:
+        """Returns the typed view of the saved mission plan, or None if there is none."""
+        return self._mission_plan_view
+
+    def get_mission_progress(self) -> Optional[MissionProgress]:
+        """Returns the current mission progress. It is frozen, so no copy is needed."""
+        return self._mission_progress
 
     def update_mission_progress(self, **kwargs):
         with self._lock:
-            self._mission_progress.update(kwargs)
+            if self._mission_progress is None:
+                self._mission_progress = MissionProgress(**kwargs)
+            else:
+                self._mission_progress = replace(self._mission_progress, **kwargs)
+            self._version += 1
 
     def log_plant_analysis(self, plant_log_entry: Dict[str, Any]):
         with self._lock:
-            self._session_plant_log.insert(0, plant_log_entry)
-            for class_name in plant_log_entry.get("detected_diseases", []):
-                self._session_detection_tally[class_name] = self._session_detection_tally.get(class_name, 0) + 1
-            if plant_log_entry.get("treatment_applied") != "None":
-                self._mission_progress["plants_treated"] = self._mission_progress.get("plants_treated", 0) + 1
+            self._session_plant_log.appendleft(plant_log_entry)
+
+            tally = self._session_detection_tally.copy()
+            tally.update(plant_log_entry.get("detected_diseases", ()))
+            self._session_detection_tally = tally
+
+            progress = self._mission_progress
+            if progress is not None:
+                treated = plant_log_entry.get("treatment_applied") != "None"
+                self._mission_progress = replace(
+                    progress,
+                    plants_scanned=progress.plants_scanned + 1,
+                    plants_treated=progress.plants_treated + treated,
+                )
+            self._version += 1
 
     def clear_mission_plan(self):
         with self._lock:
             self._mission_id = None
             self._mission_plan = {}
-            self._mission_progress = {}
+            self._mission_plan_view = None
+            self._mission_progress = None
             self._mission_message = "Start a new mission."
-            self._session_detection_tally = {}
-            self._session_plant_log = []
+            self._session_detection_tally = Counter()
+            self._session_plant_log.clear()
+            self._version += 1
 
     def get_state(self) -> RobotState:
-        with self._lock:
-            return self._current_state
+        return self._current_state
 
     def set_state(self, new_state: RobotState):
         with self._lock:
             if self._current_state != new_state:
                 self._current_state = new_state
+                self._current_state_name = new_state.name
+                self._version += 1
 
     def set_pause_state(self, pause: bool):
         with self._lock:
@@ -150,61 +279,98 @@ class RobotContext:
                 self._is_paused = True
                 self._previous_state_before_pause = self._current_state
                 self._current_state = RobotState.PAUSED
+                self._current_state_name = self._current_state.name
+                self._version += 1
             elif not pause and self._is_paused:
                 self._is_paused = False
                 self._current_state = self._previous_state_before_pause
+                self._current_state_name = self._current_state.name
+                self._version += 1
 
     def is_running(self) -> bool:
-        with self._lock:
-            return self._is_running
+        return self._is_running
 
     def set_running(self, running: bool):
         with self._lock:
             self._is_running = running
 
     def update_scan_image(self, angle: str, frame: np.ndarray):
+        """
+        Encodes the frame to JPEG once and stores the bytes for the web UI.
+        The frame is not retained, so the caller remains free to reuse it.
+        """
+        if angle not in self._latest_scan_images:
+            return
+        ok, encoded = cv2.imencode(
+            ".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, config.SCAN_IMAGE_JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+        )
+        if not ok:
+            logger.error(f"Failed to encode {angle} scan image.")
+            return
+        jpeg_bytes = encoded.tobytes()
         with self._lock:
-            if angle in self._latest_scan_images:
-                self._latest_scan_images[angle] = frame.copy()
+            self._scan_image_seq += 1
+            self._latest_scan_images[angle] = (f"{angle}-{self._scan_image_seq:x}", jpeg_bytes)
 
-    def get_scan_image(self, angle: str) -> Optional[np.ndarray]:
-        with self._lock:
-            return self._latest_scan_images.get(angle)
+    def get_scan_image(self, angle: str) -> Optional[Tuple[str, bytes]]:
+        """
+        Returns (etag, jpeg_bytes) for the latest scan of an angle, or None if there is none yet.
+        The tuple is immutable, so no lock or copy is needed.
+        """
+        return self._latest_scan_images.get(angle)
 
     def update_sensor_data(self, source: str, data: Dict[str, Any]):
         with self._lock:
             if data:
-                self._last_sensor_data.update(data)
+                self._last_sensor_data = {**self._last_sensor_data, **data}
+                self._version += 1
+        if data:
+            self._wakeup.set()
 
     def get_sensor_data(self) -> Dict[str, Any]:
-        with self._lock:
-            return self._last_sensor_data.copy()
+        """Returns the current sensor snapshot. It is replaced, never mutated, so no copy is needed."""
+        return self._last_sensor_data
 
     def set_mission_message(self, message: str):
         with self._lock:
-            self._mission_message = message
+            if self._mission_message != message:
+                self._mission_message = message
+                self._version += 1
 
     def set_manual_command(self, command: Dict):
         with self._lock:
             self._manual_command = command
+            self._manual_command_pending = True
+        self._wakeup.set()
 
     def get_manual_command(self) -> Dict:
+        if not self._manual_command_pending:
+            return {}
         with self._lock:
             cmd = self._manual_command
             self._manual_command = {}
+            self._manual_command_pending = False
             return cmd
 
     def set_web_command(self, command: str, payload: Optional[Dict] = None):
         with self._lock:
             self._web_command = {"command": command, "payload": payload or {}}
+            self._web_command_pending = True
             if command == "emergency_stop":
                 self._emergency_stop_activated = True
                 self._is_running = False
+        self._wakeup.set()
 
     def get_web_command(self) -> Optional[Dict]:
+        if not self._web_command_pending:
+            return None
         with self._lock:
             command_obj = self._web_command
             self._web_command = None
+            self._web_command_pending = False
             return command_obj
-        
 
+    def wait_for_activity(self, timeout: float) -> None:
+        """Blocks until a command or sensor update arrives, or the timeout elapses."""
+        if self._wakeup.wait(timeout):
+            self._wakeup.clear()
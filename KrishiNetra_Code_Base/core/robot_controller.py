@@ -2,29 +2,53 @@
 
 import logging
 import time
-import sys
 import os
 import cv2
-import datetime
-from typing import Dict, Any, Optional, List
-from collections import Counter
+import math
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Any, Optional, List, Tuple
 import numpy as np
 
-# Add project root to the Python path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import config
-from core.robot_context import RobotContext, RobotState
+from core.robot_context import RobotContext, RobotState, RowPlan
 from services.arduino_communicator import ArduinoCommunicator
 from hardware.camera_manager import CameraManager
 from inference.stress_detector import StressDetector
+from inference.onnx_model_wrapper import DetectionBatch
 from services.treatment_planner import TreatmentPlanner
 from services import database_manager as db
+from services.cpu_affinity import pin_current_thread
 
 logger = logging.getLogger(__name__)
 
+# States that drive the robot on their own and loop straight into the next step.
+_ACTIVE_STATES = frozenset({RobotState.EXECUTING_ROW})
+# Upper bound on how long the idle loop sleeps without a command or sensor update.
+_IDLE_WAKEUP_TIMEOUT_S = 0.5
+
+# Scan angles in capture order, with their (UI message, log message) built once.
+_SCAN_ANGLES = ("top", "middle", "bottom")
+_ANGLE_STATUS = {
+    angle_name: (f"Capturing {angle_name}...", f"Tilting to and capturing {angle_name}...")
+    for angle_name in _SCAN_ANGLES
+}
+
 class RobotController:
     """The main orchestrator of the Krishinetra robot, with snapshot-based analysis and detailed status feedback."""
 
+    # Manual drive commands: fixed-speed moves are complete strings, forward/backward only
+    # need the requested speed filled in with the correct sign.
+    _MOVE_CMD = "MOVE:{}:{}".format
+    _MANUAL_FIXED_MOVES = {
+        "left": _MOVE_CMD(-config.MANUAL_TURN_SPEED, config.MANUAL_TURN_SPEED),
+        "right": _MOVE_CMD(config.MANUAL_TURN_SPEED, -config.MANUAL_TURN_SPEED),
+        "stop": _MOVE_CMD(0, 0),
+    }
+    _MANUAL_DRIVE_SIGN = {"forward": 1, "backward": -1}
+
     def __init__(self) -> None:
         logger.info(f"Initializing {config.PROJECT_NAME} Controller...")
         self.context = RobotContext()
@@ -34,9 +58,30 @@ class RobotController:
         self.nano_comm = ArduinoCommunicator(
             config.NANO_SERIAL_PORT, config.SERIAL_BAUD_RATE, name="Nano"
         )
-        self.camera = CameraManager()
+        # The camera's ISP produces detector-sized frames alongside the full-resolution ones.
+        self.camera = CameraManager(model_input_size=config.STRESS_MODEL_INPUT_SIZE)
         self.stress_detector = StressDetector()
         self.treatment_planner = TreatmentPlanner()
+
+        # Command strings and odometry factors depend only on config, so build them once.
+        self._pulses_per_cm = config.ENCODER_PULSES_PER_ROTATION / config.WHEEL_CIRCUMFERENCE_CM
+        self._image_dir_prefix = os.path.join(config.CAPTURED_IMAGES_DATA_PATH, "")
+        self._cmd_pan_left = f"PAN:{config.CAMERA_ANGLES['pan_left']}"
+        self._cmd_pan_straight = f"PAN:{config.CAMERA_ANGLES['pan_straight']}"
+        self._cmd_tilt = {
+            angle_name: f"TILT:{config.CAMERA_ANGLES[f'tilt_{angle_name}']}"
+            for angle_name in _SCAN_ANGLES
+        }
+        # A single worker runs the batched YOLO pass while the camera tilts back to the middle.
+        self._inference_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="Inference",
+            initializer=partial(pin_current_thread, config.INFERENCE_CPU_CORES, "inference"),
+        )
+        # All SD-card writes (detection images and DB rows) go through one bounded queue
+        # drained by a background thread, so the scan never waits on storage.
+        self._persist_q: "queue.Queue[Optional[Tuple[str, Any]]]" = queue.Queue(maxsize=64)
+        self._persist_thread = threading.Thread(target=self._persist_worker_loop, daemon=True, name="Persist")
+        self._persist_thread.start()
         self.is_initialized = self._verify_initialization()
 
     def _verify_initialization(self) -> bool:
@@ -71,14 +116,13 @@ class RobotController:
             self.uno_comm.send_command("STOP", expect_ack=False)
 
         if self.nano_comm.is_connected:
-            self.nano_comm.send_command(
-                f"PAN:{config.CAMERA_ANGLES['pan_straight']}", expect_ack=False
-            )
-            self.nano_comm.send_command(
-                f"TILT:{config.CAMERA_ANGLES['tilt_middle']}", expect_ack=False
-            )
+            self.nano_comm.send_command(self._cmd_pan_straight, expect_ack=False)
+            self.nano_comm.send_command(self._cmd_tilt["middle"], expect_ack=False)
             self.nano_comm.send_command("INDICATE:error", expect_ack=False)
 
+        self._inference_executor.shutdown(wait=True)
+        self._persist_q.put(None)
+        self._persist_thread.join(timeout=10)
         self.camera.shutdown()
         self.uno_comm.disconnect()
         self.nano_comm.disconnect()
@@ -102,7 +146,9 @@ class RobotController:
                         exc_info=True,
                     )
                     self._handle_error("Internal controller error occurred. Check logs.")
-                time.sleep(0.1)
+                # Waiting states sleep until the web UI or the sensors post something new.
+                if self.context.get_state() not in _ACTIVE_STATES:
+                    self.context.wait_for_activity(_IDLE_WAKEUP_TIMEOUT_S)
         except (KeyboardInterrupt, SystemExit):
             logger.info("Termination signal received. Shutting down.")
         finally:
@@ -121,7 +167,7 @@ class RobotController:
         }
 
     def _wait(self) -> None:
-        time.sleep(0.5)
+        """Nothing to do; run() sleeps until a command or sensor update wakes it."""
 
     def _execute_state_manual_control(self) -> None:
         self.context.set_mission_message("Manual Control Active")
@@ -129,35 +175,33 @@ class RobotController:
         if not cmd:
             return
         if cmd.get("type") == "move":
-            speed = int(cmd.get("speed", config.MANUAL_DEFAULT_SPEED))
             direction = cmd.get("direction")
-            move_cmds = {
-                "forward": (speed, speed), "backward": (-speed, -speed),
-                "left": (-config.MANUAL_TURN_SPEED, config.MANUAL_TURN_SPEED),
-                "right": (config.MANUAL_TURN_SPEED, -config.MANUAL_TURN_SPEED),
-                "stop": (0, 0),
-            }
-            left, right = move_cmds.get(direction, (0, 0))
-            self.uno_comm.send_command(f"MOVE:{left}:{right}")
+            sign = self._MANUAL_DRIVE_SIGN.get(direction)
+            if sign is None:
+                move_cmd = self._MANUAL_FIXED_MOVES.get(direction, self._MANUAL_FIXED_MOVES["stop"])
+            else:
+                speed = sign * int(cmd.get("speed", config.MANUAL_DEFAULT_SPEED))
+                move_cmd = self._MOVE_CMD(speed, speed)
+            self.uno_comm.send_command(move_cmd)
         elif cmd.get("type") == "pump":
             self.uno_comm.send_command(f"PUMP:{cmd.get('tank')}:{1 if cmd.get('state') else 0}")
         elif cmd.get("type") == "servo" and cmd.get("servo") and cmd.get("angle") is not None:
             self.nano_comm.send_command(f"{cmd['servo'].upper()}:{cmd['angle']}")
 
     def _execute_state_executing_row(self) -> None:
-        ui_data = self.context.get_all_data_for_ui()
-        plan: Dict[str, Any] = ui_data.get("mission_plan") or {}
-        progress: Dict[str, Any] = ui_data.get("mission_progress") or {}
-        layout = plan.get("layoutMode")
-        op_mode = plan.get("operationMode")
-        map_rows: List[Dict[str, Any]] = plan.get("map") or []
-
-        if not layout or not op_mode or not map_rows:
+        # Typed views, validated when the plan was saved; progress written during the
+        # iteration is re-read through get_mission_progress().
+        plan = self.context.get_mission_plan()
+        progress = self.context.get_mission_progress()
+
+        if plan is None or progress is None or not plan.layout_mode or not plan.operation_mode or not plan.rows:
             self._handle_error("Mission plan is empty or invalid.")
             return
 
-        current_row_idx = int(progress.get("current_row_index", 0))
-        current_plant_idx = int(progress.get("current_plant_index", 0))
+        op_mode = plan.operation_mode
+        map_rows = plan.rows
+        current_row_idx = progress.current_row_index
+        current_plant_idx = progress.current_plant_index
 
         if current_row_idx >= len(map_rows):
             self._complete_mission()
@@ -165,11 +209,11 @@ class RobotController:
         
         if current_plant_idx == 0:
             logger.info(f"Start of Row #{current_row_idx + 1}. Panning camera left.")
-            self.nano_comm.send_command(f"PAN:{config.CAMERA_ANGLES['pan_left']}", expect_ack=False)
+            self.nano_comm.send_command(self._cmd_pan_left, expect_ack=False)
             time.sleep(config.CAMERA_SETTLE_TIME_S)
 
         if current_plant_idx > 0:
-            move_dist = float(plan.get("scan_step_cm", 0.0)) if op_mode == "continuous" else float(map_rows[current_row_idx].get("spacing_cm", 0.0))
+            move_dist = plan.scan_step_cm if op_mode == "continuous" else map_rows[current_row_idx].spacing_cm
             if move_dist <= 0:
                 self._handle_error("Invalid mission: movement distance is 0.")
                 return
@@ -179,16 +223,15 @@ class RobotController:
             if not self._move_distance_cm(move_dist):
                 self._handle_error("Movement failed. Mission aborted.")
                 return
-            prev_dist = float(progress.get("total_distance_in_row_cm", 0.0))
-            self.context.update_mission_progress(total_distance_in_row_cm=prev_dist + move_dist)
+            self.context.update_mission_progress(total_distance_in_row_cm=progress.total_distance_in_row_cm + move_dist)
 
-        detection_found = self._analyze_plant_at_current_location()
-        consec_empty = 0 if detection_found else int(progress.get("consecutive_empty_scans", 0)) + 1
+        detection_found = self._analyze_plant_at_current_location(self.context.get_mission_id(), current_plant_idx + 1)
+        consec_empty = 0 if detection_found else progress.consecutive_empty_scans + 1
         self.context.update_mission_progress(consecutive_empty_scans=consec_empty)
 
-        if self._end_of_row_check():
+        if self._end_of_row_check(op_mode, map_rows[current_row_idx]):
             logger.info("End of row reached. Panning camera to front.")
-            self.nano_comm.send_command(f"PAN:{config.CAMERA_ANGLES['pan_straight']}", expect_ack=False)
+            self.nano_comm.send_command(self._cmd_pan_straight, expect_ack=False)
             time.sleep(config.CAMERA_SETTLE_TIME_S)
 
             if current_row_idx >= len(map_rows) - 1:
@@ -211,109 +254,128 @@ class RobotController:
         self.context.set_mission_message("Mission Complete! View summary below.")
         self.context.set_state(RobotState.IDLE)
 
-    def _analyze_plant_at_current_location(self) -> bool:
-        ui_data = self.context.get_all_data_for_ui()
-        mission_id: Optional[str] = ui_data.get("mission_id")
-        plant_num = int(ui_data.get("mission_progress", {}).get("current_plant_index", 0)) + 1
+    def _analyze_plant_at_current_location(self, mission_id: Optional[str], plant_num: int) -> bool:
         self.context.set_mission_message(f"Starting analysis for Plant #{plant_num}...")
         logger.info(f"--- Plant #{plant_num} Analysis Started ---")
         self.nano_comm.send_command("INDICATE:working", expect_ack=False)
 
-        all_detections_in_scan: List[Dict[str, Any]] = []
-        plant_log_entry = {"plant_number": plant_num, "detected_diseases": set(), "images": {}, "treatment_applied": "None"}
+        # Class ids of every detection on this plant, one array per angle.
+        angle_class_ids: List[np.ndarray] = []
+        plant_log_entry = {"plant_number": plant_num, "detected_diseases": [], "images": {}, "treatment_applied": "None"}
+        # Detection rows are collected for the whole plant and written in one transaction.
+        db_rows: List[Tuple] = []
 
-        for angle_name in ["top", "middle", "bottom"]:
+        # Phase 1: capture all angles as (angle, full frame, detector-sized frame).
+        captured: List[Tuple[str, np.ndarray, np.ndarray]] = []
+        for angle_name in _SCAN_ANGLES:
             if self.context.get_state() != RobotState.EXECUTING_ROW:
                 logger.warning("State changed during analysis. Aborting scan for this plant.")
                 return False
 
-            self.context.set_mission_message(f"Capturing {angle_name}...")
-            logger.info(f"Tilting to and capturing {angle_name}...")
-            self.nano_comm.send_command(f"TILT:{config.CAMERA_ANGLES[f'tilt_{angle_name}']}", expect_ack=False)
-            time.sleep(config.CAMERA_SETTLE_TIME_S + 0.5)
+            ui_message, log_message = _ANGLE_STATUS[angle_name]
+            self.context.set_mission_message(ui_message)
+            logger.debug(log_message)
+            # The Nano reports <DONE:TILT> once the servo has arrived and settled.
+            if not self.nano_comm.send_command_await(self._cmd_tilt[angle_name], "DONE:TILT", config.TILT_DONE_TIMEOUT_S):
+                logger.warning(f"No tilt confirmation for {angle_name}; capturing anyway.")
 
-            frame = self.camera.capture_frame()
-            if frame is None:
+            frames = self.camera.capture_frames()
+            if frames is None:
                 logger.error(f"CAMERA FAILED at {angle_name} angle. Skipping.")
                 continue
+            frame, model_frame = frames
             self.context.update_scan_image(angle_name, frame)
-            
-            time.sleep(config.YOLO_PRE_PROCESSING_DELAY_S)
+            captured.append((angle_name, frame, model_frame))
 
-            self.context.set_mission_message(f"Processing {angle_name}...")
-            logger.info(f"Running YOLO on {angle_name} view.")
-            
-            detections = self.stress_detector.detect(frame)
-
-            if detections:
-                detected_names = {d["class_name"] for d in detections}
-                logger.info(f"Detected at {angle_name}: {', '.join(sorted(detected_names))}")
-                plant_log_entry["detected_diseases"].update(detected_names)
-                all_detections_in_scan.extend(detections)
-                image_path_rel = self._save_detection_image(frame, mission_id, plant_num, angle_name, detected_names)
-                if image_path_rel:
-                    plant_log_entry["images"][angle_name] = image_path_rel
-                    for det in detections:
-                        db.log_detection(mission_id, plant_num, angle_name, det["class_name"], det["confidence"], image_path_rel)
-            else:
-                logger.info(f"No stress found at {angle_name}.")
-            
-            time.sleep(config.YOLO_POST_PROCESSING_DELAY_S)
-
-        self.nano_comm.send_command(f"TILT:{config.CAMERA_ANGLES['tilt_middle']}", expect_ack=False)
+        # Phase 2: one batched inference over every captured angle, overlapped with the
+        # camera returning to the middle position.
+        if captured:
+            time.sleep(config.YOLO_PRE_PROCESSING_DELAY_S)
+            self.context.set_mission_message("Processing all angles...")
+            logger.info(f"Running YOLO on {len(captured)} views.")
+            future = self._inference_executor.submit(
+                self.stress_detector.detect_batch, [model_frame for _, _, model_frame in captured]
+            )
+            self.nano_comm.send_command(self._cmd_tilt["middle"], expect_ack=False)
+            for (angle_name, frame, _), detections in zip(captured, future.result()):
+                class_ids = self._record_angle_detections(
+                    angle_name, frame, detections, mission_id, plant_num, plant_log_entry, db_rows
+                )
+                if class_ids.size:
+                    angle_class_ids.append(class_ids)
+        else:
+            self.nano_comm.send_command(self._cmd_tilt["middle"], expect_ack=False)
 
-        if not all_detections_in_scan:
+        if not angle_class_ids:
             self.context.set_mission_message(f"Plant #{plant_num}: Healthy")
             logger.info(f"Plant #{plant_num} is Healthy.")
-            plant_log_entry["detected_diseases"].add("Healthy")
+            plant_log_entry["detected_diseases"] = ["Healthy"]
             detection_found = False
-            try:
-                db.log_detection(
-                    mission_id=mission_id,
-                    plant_number=plant_num,
-                    scan_angle='overall',
-                    stress_detected='Healthy',
-                    confidence=1.0,
-                    image_path=None
-                )
-            except Exception as db_err:
-                logger.error(f"Failed to log Healthy status to DB: {db_err}", exc_info=True)
+            db_rows.append((mission_id, plant_num, 'overall', 'Healthy', 1.0, None))
         else:
-            unique_diseases = sorted(list(plant_log_entry["detected_diseases"]))
+            # One numpy pass over the plant's ids replaces per-angle set unions of names.
+            plant_class_ids = np.concatenate(angle_class_ids)
+            unique_diseases = self._class_names_for(plant_class_ids)
+            plant_log_entry["detected_diseases"] = unique_diseases
             self.context.set_mission_message(f"Detected from 3 angles: {', '.join(unique_diseases)}")
             logger.info(f"Detections for Plant #{plant_num}: {unique_diseases}. Deciding treatment...")
             time.sleep(1)
-            treatment_applied = self._decide_and_apply_treatment(all_detections_in_scan)
+            treatment_applied = self._decide_and_apply_treatment(plant_class_ids)
             if treatment_applied:
                 plant_log_entry["treatment_applied"] = treatment_applied
             detection_found = True
 
-        plant_log_entry["detected_diseases"] = sorted(list(plant_log_entry["detected_diseases"]))
+        if db_rows:
+            self._persist_q.put(("db", db_rows))
         self.context.log_plant_analysis(plant_log_entry)
         logger.info(f"--- Plant #{plant_num} Analysis Complete ---")
         return detection_found
 
-    def _decide_and_apply_treatment(self, detections: List[Dict[str, Any]]) -> Optional[str]:
+    def _record_angle_detections(
+        self, angle_name: str, frame: np.ndarray, detections: DetectionBatch, mission_id: Optional[str],
+        plant_num: int, plant_log_entry: Dict[str, Any], db_rows: List[Tuple]
+    ) -> np.ndarray:
+        """Logs, saves and records one angle's detections, queueing DB rows and returning their class ids."""
+        class_ids = detections.class_ids
+        if class_ids.size:
+            detected_names = self._class_names_for(class_ids)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Detected at {angle_name}: {', '.join(detected_names)}")
+            image_path_rel = self._save_detection_image(frame, mission_id, plant_num, angle_name, detected_names)
+            if image_path_rel:
+                plant_log_entry["images"][angle_name] = image_path_rel
+                db_rows.extend(
+                    (mission_id, plant_num, angle_name, class_name, confidence, image_path_rel)
+                    for class_name, confidence in zip(detections.names(), detections.scores.tolist())
+                )
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"No stress found at {angle_name}.")
+        return class_ids
+
+    def _class_names_for(self, class_ids: np.ndarray) -> List[str]:
+        """Returns the sorted, de-duplicated class names for an array of class ids."""
+        class_names = self.stress_detector.class_names
+        return sorted(class_names[class_id] for class_id in np.unique(class_ids))
+
+    def _decide_and_apply_treatment(self, class_ids: np.ndarray) -> Optional[str]:
         """
-        Aggregates detections and applies the most appropriate treatment based on real sensor data.
+        Aggregates the plant's detection class ids and applies the most appropriate
+        treatment based on real sensor data.
         """
-        if not detections:
+        if not class_ids.size:
             return None
 
-        group_counts = Counter()
-        for det in detections:
-            group = self.treatment_planner.get_group_for_stress(det["class_name"])
-            if group:
-                group_counts[group["name"]] += 1
+        # Healthy and unmapped classes fall outside the histogram.
+        group_counts = self.treatment_planner.group_histogram(class_ids)
         
-        if not group_counts:
+        if not group_counts.any():
             logger.warning("Detections found, but none mapped to a treatment group.")
             return None
 
         # Priority 1: Nutrient/Fertilizer Group.
-        fertilizer_group_name = config.FERTILIZER_GROUP["name"]
-        if fertilizer_group_name in group_counts:
-            logger.info(f"Prioritizing treatment for '{fertilizer_group_name}'.")
+        fertilizer_idx = self.treatment_planner.fertilizer_group_index
+        if group_counts[fertilizer_idx]:
+            logger.info(f"Prioritizing treatment for '{config.FERTILIZER_GROUP['name']}'.")
             plan_step = self.treatment_planner.create_plan_for_group(
                 config.FERTILIZER_GROUP, self.context.get_sensor_data()
             )
@@ -322,23 +384,19 @@ class RobotController:
                 return plan_step["treatment_name"]
 
         # Priority 2: Pesticides.
-        group_counts.pop(fertilizer_group_name, None)
-        if not group_counts:
+        group_counts[fertilizer_idx] = 0
+        if not group_counts.any():
             return None 
 
-        dominant_group_name, _ = group_counts.most_common(1)[0]
-        logger.info(f"Dominant pesticide group is '{dominant_group_name}'.")
-
-        all_pesticide_groups = [config.PESTICIDE_GROUP_1, config.PESTICIDE_GROUP_2]
-        dominant_group_config = next((g for g in all_pesticide_groups if g["name"] == dominant_group_name), None)
+        dominant_group_config = config.TREATMENT_GROUPS[int(np.argmax(group_counts))]
+        logger.info(f"Dominant pesticide group is '{dominant_group_config['name']}'.")
 
-        if dominant_group_config:
-            plan_step = self.treatment_planner.create_plan_for_group(
-                dominant_group_config, self.context.get_sensor_data()
-            )
-            if plan_step:
-                self._execute_treatment_step(plan_step)
-                return plan_step["treatment_name"]
+        plan_step = self.treatment_planner.create_plan_for_group(
+            dominant_group_config, self.context.get_sensor_data()
+        )
+        if plan_step:
+            self._execute_treatment_step(plan_step)
+            return plan_step["treatment_name"]
 
         return None
 
@@ -350,39 +408,72 @@ class RobotController:
         timeout_s = (duration_ms / 1000.0) + 2.0
         self.uno_comm.send_command(f"SPRAY:{step['tank_num']}:{duration_ms}", timeout=timeout_s)
 
-    def _save_detection_image(self, frame: np.ndarray, mission_id: Optional[str], plant_num: int, angle: str, detected_names: set) -> Optional[str]:
+    def _save_detection_image(self, frame: np.ndarray, mission_id: Optional[str], plant_num: int, angle: str, detected_names: List[str]) -> Optional[str]:
         try:
-            timestamp = datetime.datetime.now().strftime("%H%M%S")
-            primary_stress = sorted(list(detected_names))[0].replace(" ", "_")
+            # Local HHMMSS straight from the struct_time fields; cheaper than strftime.
+            now = time.localtime()
+            timestamp = f"{now.tm_hour:02d}{now.tm_min:02d}{now.tm_sec:02d}"
+            primary_stress = detected_names[0].replace(" ", "_")  # Names arrive sorted.
             mission_suffix = (mission_id or "UNKNOWN").split("-")[-1]
             filename = f"msn_{mission_suffix}_p{plant_num}_{angle}_{primary_stress}_{timestamp}.jpg"
-            abs_path = os.path.join(config.CAPTURED_IMAGES_DATA_PATH, filename)
-            cv2.imwrite(abs_path, frame)
+            abs_path = self._image_dir_prefix + filename
+            ok, encoded = cv2.imencode(
+                ".jpg", frame,
+                [cv2.IMWRITE_JPEG_QUALITY, config.DETECTION_IMAGE_JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 0],
+            )
+            if not ok:
+                logger.error(f"Failed to encode detection image '{filename}'.")
+                return None
+            # The encoded bytes are independent of the frame buffer, so nothing needs copying.
+            self._persist_q.put(("img", (abs_path, encoded)))
             return filename
         except Exception as e:
             logger.error(f"Failed to save detection image: {e}", exc_info=True)
             return None
 
-    def _end_of_row_check(self) -> bool:
-        ui_data = self.context.get_all_data_for_ui()
-        plan, progress = ui_data.get("mission_plan", {}), ui_data.get("mission_progress", {})
-        op_mode, map_rows = plan.get("operationMode"), plan.get("map", [])
-        if not map_rows: return True
-        current_row_idx = int(progress.get("current_row_index", 0))
-        if current_row_idx >= len(map_rows): return True
-        row_cfg = map_rows[current_row_idx]
+    def _persist_worker_loop(self) -> None:
+        """Drains the persist queue until a None sentinel arrives at shutdown."""
+        while True:
+            item = self._persist_q.get()
+            try:
+                if item is None:
+                    return
+                kind, payload = item
+                if kind == "img":
+                    self._write_image_file(*payload)
+                elif kind == "db":
+                    db.log_detections_bulk(payload)
+            except Exception as e:
+                logger.error(f"Persist worker failed on '{item[0]}' item: {e}", exc_info=True)
+            finally:
+                self._persist_q.task_done()
+
+    @staticmethod
+    def _write_image_file(abs_path: str, encoded: np.ndarray) -> None:
+        """Writes an already-encoded image to disk. Runs on the persist thread."""
+        try:
+            with open(abs_path, "wb") as f:
+                f.write(encoded.tobytes())
+        except OSError as e:
+            logger.error(f"Failed to write detection image '{abs_path}': {e}", exc_info=True)
+
+    def _end_of_row_check(self, op_mode: str, row_cfg: RowPlan) -> bool:
+        """Checks the current row's end condition, cheapest test first. The caller has already bounds-checked the row."""
+        progress = self.context.get_mission_progress()
         
         if op_mode == "individual":
-            return int(progress.get("current_plant_index", 0)) >= int(row_cfg.get("num_plants", 1)) -1
+            return progress.current_plant_index >= row_cfg.num_plants - 1
         
         if op_mode == "continuous":
-            total_length_cm = row_cfg.get("total_length_cm")
-            if isinstance(total_length_cm, (int, float)) and total_length_cm > 0:
-                return float(progress.get("total_distance_in_row_cm", 0.0)) >= float(total_length_cm)
+            if row_cfg.total_length_cm is not None:
+                return progress.total_distance_in_row_cm >= row_cfg.total_length_cm
             
+            # The sensor snapshot is only consulted once enough empty scans have accumulated.
+            consec_empty = progress.consecutive_empty_scans
+            if consec_empty < config.NO_DETECTION_END_OF_ROW_CONSECUTIVE:
+                return False
             side_us = self.context.get_sensor_data().get("S", 0) or 0
-            consec_empty = int(progress.get("consecutive_empty_scans", 0))
-            if float(side_us) > config.SIDE_US_END_OF_ROW_THRESHOLD_CM and consec_empty >= config.NO_DETECTION_END_OF_ROW_CONSECUTIVE:
+            if float(side_us) > config.SIDE_US_END_OF_ROW_THRESHOLD_CM:
                 logger.info(f"End-of-row by sensor: S={side_us}cm, empty_scans={consec_empty}")
                 return True
         return False
@@ -392,34 +483,23 @@ class RobotController:
             return True
 
         self.uno_comm.send_command("RESET_ENCODER")
-        time.sleep(0.1)
 
-        target_pulses = (
-            abs(distance_cm) / config.WHEEL_CIRCUMFERENCE_CM
-        ) * config.ENCODER_PULSES_PER_ROTATION
+        target_pulses = math.ceil(abs(distance_cm) * self._pulses_per_cm)
         direction = 1 if distance_cm > 0 else -1
-        start_time = time.time()
-
-        self.uno_comm.send_command(f"MOVE:{speed * direction}:{speed * direction}")
-
-        while True:
-            sensors = self.uno_comm.get_sensors()
-            if not sensors:
-                self.uno_comm.send_command("STOP")
-                return False
-
-            encoder_pulses = sensors.get("E", 0) or 0
 
-            if encoder_pulses >= target_pulses:
-                break
-
-            if time.time() - start_time > 20:
-                self._handle_error("Movement timed out.")
-                return False
+        # The Uno stops itself at the target and reports <DONE:MOVE:OK|TIMEOUT>.
+        self.uno_comm.clear_event("DONE:MOVE")
+        if not self.uno_comm.send_command(f"MOVE:{speed * direction}:{speed * direction}:TARGET:{target_pulses}"):
+            self.uno_comm.send_command("STOP")
+            return False
 
-            time.sleep(0.1)
+        # A little slack over the firmware's own timeout so its DONE message still arrives.
+        done = self.uno_comm.wait_for_event("DONE:MOVE", timeout=config.MOVE_TIMEOUT_S + 1.0)
+        if done is None or done["payload_str"] != "MOVE:OK":
+            self.uno_comm.send_command("STOP")
+            self._handle_error("Movement timed out.")
+            return False
 
-        self.uno_comm.send_command("STOP")
         return True
 
     def _handle_error(self, message: str) -> None:
@@ -440,7 +520,11 @@ class RobotController:
         logger.info(f"Processing web command: '{command}' in state {state.name}")
 
         if command == "save_mission":
-            self.context.save_mission_plan(payload)
+            try:
+                self.context.save_mission_plan(payload)
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.error(f"Rejected malformed mission plan: {e}")
+                self.context.set_mission_message("Mission plan is invalid. Please check the values and save again.")
         elif command == "start_mission" and state == RobotState.MISSION_AWAITING_START:
             self.context.set_state(RobotState.EXECUTING_ROW)
         elif command == "stop_mission":
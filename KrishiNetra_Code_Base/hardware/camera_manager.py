@@ -4,18 +4,35 @@ import logging
 import time
 import cv2
 import numpy as np
-from typing import Optional
+from typing import Optional, Tuple
 
 # Attempt to import Raspberry Pi specific libraries
 try:
-    from picamera2 import Picamera2
+    from picamera2 import Picamera2, MappedArray
 except ImportError:
     # This allows the code to be syntax-checked on a non-Pi machine.
     print("WARNING: RPi-specific library 'picamera2' not found. Using mock object.")
     Picamera2 = None
+    MappedArray = None
 
 logger = logging.getLogger(__name__)
 
+# Main stream resolution (width, height).
+_FRAME_SIZE = (640, 480)
+# One buffer per scan angle, so all three frames of a plant stay valid until the next plant.
+_FRAME_RING_SIZE = 3
+
+
+def _letterbox_content_size(frame_size: Tuple[int, int], model_input_size: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Returns the (width, height) a frame is scaled to when letterboxed into the model input,
+    rounded down to even values as YUV420 requires.
+    """
+    frame_w, frame_h = frame_size
+    model_w, model_h = model_input_size
+    ratio = min(model_w / frame_w, model_h / frame_h)
+    return int(frame_w * ratio) // 2 * 2, int(frame_h * ratio) // 2 * 2
+
 class CameraManager:
     """
     Manages the Raspberry Pi camera for the Krishinetra project.
@@ -24,9 +41,27 @@ class CameraManager:
     capturing frames, and shutting down the camera hardware. All servo control
     has been offloaded to the Arduino Nano for better real-time performance.
     """
-    def __init__(self):
+    def __init__(self, model_input_size: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            model_input_size (Optional[Tuple[int, int]]): The detector's input size (width, height).
+                When given, a second low-resolution stream is configured so the ISP scales
+                frames down to the detector's letterbox size instead of the CPU.
+        """
         self.is_operational: bool = False
         self.picam2: Optional[Picamera2] = None
+        # Frames are copied into a fixed ring of buffers instead of allocating one per capture.
+        width, height = _FRAME_SIZE
+        self._frame_ring = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(_FRAME_RING_SIZE)]
+        self._ring_index = 0
+
+        self._lores_size: Optional[Tuple[int, int]] = None
+        if model_input_size:
+            self._lores_size = _letterbox_content_size(_FRAME_SIZE, model_input_size)
+            lores_w, lores_h = self._lores_size
+            # The lores stream is YUV420 only on most Pi models; it is converted into BGR buffers.
+            self._lores_yuv = np.empty((lores_h * 3 // 2, lores_w), dtype=np.uint8)
+            self._lores_ring = [np.empty((lores_h, lores_w, 3), dtype=np.uint8) for _ in range(_FRAME_RING_SIZE)]
 
         if not Picamera2:
             logger.critical("Failed to initialize CameraManager: picamera2 library is not installed.")
@@ -38,8 +73,14 @@ class CameraManager:
             
             # Create a configuration for the camera. 640x480 is a good balance
             # between performance and detail for object detection on a Pi.
-            cam_config = self.picam2.create_preview_configuration(
-                main={"size": (640, 480), "format": "XRGB8888"}
+            # Frames are only needed on demand after each tilt, so a single buffer
+            # is enough and keeps the pipeline from queuing stale frames.
+            # picamera2's "RGB888" is laid out as B, G, R in memory, i.e. OpenCV's native
+            # 3-channel BGR, so frames need no colour conversion after capture.
+            cam_config = self.picam2.create_still_configuration(
+                main={"size": _FRAME_SIZE, "format": "RGB888"},
+                lores={"size": self._lores_size, "format": "YUV420"} if self._lores_size else None,
+                buffer_count=1,
             )
             self.picam2.configure(cam_config)
             
@@ -89,19 +130,51 @@ class CameraManager:
 
         Returns:
             np.ndarray: The captured frame as a NumPy array in BGR format (for OpenCV),
-                        or None if an error occurs.
+                        or None if an error occurs. The array is one of a ring of reused
+                        buffers and is overwritten after another _FRAME_RING_SIZE captures;
+                        callers that keep it longer must copy it.
+        """
+        frames = self.capture_frames()
+        return frames[0] if frames else None
+
+    def capture_frames(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Captures the full-resolution frame and a detector-sized copy from the same request.
+
+        Returns:
+            Optional[Tuple[np.ndarray, np.ndarray]]: (frame, model_frame), both BGR and both
+                from reused ring buffers like capture_frame(). model_frame is the ISP-scaled
+                lores stream when configured, otherwise the full frame itself. None on error.
         """
         if not self.is_operational or not self.picam2 or not self.picam2.started:
             logger.error("Cannot capture frame, camera is not running.")
             return None
         
         try:
-            # Capture the frame. The picamera2 library returns it in RGB format.
-            frame_rgb = self.picam2.capture_array()
-            
-            # Convert the frame from RGB to BGR, which is the standard format used by OpenCV.
-            frame_bgr = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
-            return frame_bgr
+            frame_bgr = self._frame_ring[self._ring_index]
+            height, width = frame_bgr.shape[:2]
+            model_frame = frame_bgr
+
+            # Take the next completed request and copy its main stream, which is already
+            # BGR thanks to the RGB888 stream format, straight into the ring buffer.
+            request = self.picam2.capture_request()
+            try:
+                with MappedArray(request, "main") as mapped:
+                    np.copyto(frame_bgr, mapped.array[:height, :width])
+                if self._lores_size:
+                    lores_w = self._lores_size[0]
+                    with MappedArray(request, "lores") as mapped:
+                        np.copyto(self._lores_yuv, mapped.array[:, :lores_w])
+            finally:
+                # Hand the buffer back to the camera as soon as the frames are copied out.
+                request.release()
+
+            if self._lores_size:
+                model_frame = self._lores_ring[self._ring_index]
+                cv2.cvtColor(self._lores_yuv, cv2.COLOR_YUV2BGR_I420, dst=model_frame)
+
+            self._ring_index = (self._ring_index + 1) % _FRAME_RING_SIZE
+            return frame_bgr, model_frame
             
         except Exception as e:
             logger.error(f"Failed to capture frame: {e}", exc_info=True)
@@ -0,0 +1,99 @@
+# inference/_kernels.py
+
+"""
+Numba-compiled kernels for YOLOv8 post-processing.
+
+Numba is an optional dependency. When it is not installed HAVE_NUMBA is False and
+ONNXModelWrapper keeps using its NumPy implementation, which produces the same detections.
+Compiled code is cached next to this module, so the JIT cost is only paid on the first boot.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+
+if HAVE_NUMBA:
+
+    @njit(cache=True, fastmath=True)
+    def decode_boxes(outputs, conf_thresh, x_scale, y_scale, pad_x, pad_y):
+        """
+        Decodes a channel-major (4 + classes, anchors) YOLOv8 output into the anchors whose
+        best class score reaches conf_thresh. Returns (boxes, scores, class_ids), with boxes
+        as (N, 4) [left, top, width, height] in original image coordinates.
+        """
+        num_channels, num_anchors = outputs.shape
+
+        # Running per-anchor max over the class rows; each row is read with unit stride.
+        best_scores = outputs[4].copy()
+        best_ids = np.zeros(num_anchors, dtype=np.int64)
+        for channel in range(5, num_channels):
+            row = outputs[channel]
+            for anchor in range(num_anchors):
+                if row[anchor] > best_scores[anchor]:
+                    best_scores[anchor] = row[anchor]
+                    best_ids[anchor] = channel - 4
+
+        count = 0
+        for anchor in range(num_anchors):
+            if best_scores[anchor] >= conf_thresh:
+                count += 1
+
+        boxes = np.empty((count, 4), dtype=np.float32)
+        scores = np.empty(count, dtype=np.float32)
+        class_ids = np.empty(count, dtype=np.int64)
+        kept = 0
+        for anchor in range(num_anchors):
+            if best_scores[anchor] >= conf_thresh:
+                w = outputs[2, anchor]
+                h = outputs[3, anchor]
+                boxes[kept, 0] = ((outputs[0, anchor] - w / 2) - pad_x) / x_scale
+                boxes[kept, 1] = ((outputs[1, anchor] - h / 2) - pad_y) / y_scale
+                boxes[kept, 2] = w / x_scale
+                boxes[kept, 3] = h / y_scale
+                scores[kept] = best_scores[anchor]
+                class_ids[kept] = best_ids[anchor]
+                kept += 1
+        return boxes, scores, class_ids
+
+    @njit(cache=True, fastmath=True)
+    def class_nms(boxes, scores, class_ids, iou_thresh):
+        """
+        Greedy per-class non-max suppression over [left, top, width, height] boxes.
+        Returns the indices of the kept boxes, highest score first.
+        """
+        order = np.argsort(-scores, kind="mergesort")
+        suppressed = np.zeros(order.size, dtype=np.bool_)
+        keep = np.empty(order.size, dtype=np.intp)
+        num_kept = 0
+        for rank in range(order.size):
+            best = order[rank]
+            if suppressed[best]:
+                continue
+            keep[num_kept] = best
+            num_kept += 1
+            x1, y1 = boxes[best, 0], boxes[best, 1]
+            x2, y2 = x1 + boxes[best, 2], y1 + boxes[best, 3]
+            area = boxes[best, 2] * boxes[best, 3]
+            for other_rank in range(rank + 1, order.size):
+                other = order[other_rank]
+                if suppressed[other] or class_ids[other] != class_ids[best]:
+                    continue
+                inter_w = min(x2, boxes[other, 0] + boxes[other, 2]) - max(x1, boxes[other, 0])
+                inter_h = min(y2, boxes[other, 1] + boxes[other, 3]) - max(y1, boxes[other, 1])
+                if inter_w <= 0 or inter_h <= 0:
+                    continue
+                inter = inter_w * inter_h
+                union = area + boxes[other, 2] * boxes[other, 3] - inter
+                if inter / max(union, 1e-9) > iou_thresh:
+                    suppressed[other] = True
+        return keep[:num_kept]
+
+    def warm_up() -> None:
+        """Compiles (or loads from cache) both kernels for float32 model outputs."""
+        boxes, scores, class_ids = decode_boxes(np.zeros((5, 1), dtype=np.float32), 0.0, 1.0, 1.0, 0.0, 0.0)
+        class_nms(boxes, scores, class_ids, 0.5)
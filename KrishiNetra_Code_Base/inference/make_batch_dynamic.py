@@ -0,0 +1,69 @@
+# inference/make_batch_dynamic.py
+
+"""
+Gives an exported YOLOv8 ONNX model a dynamic batch axis.
+
+Ultralytics exports with a fixed batch of 1 unless `dynamic=True` is passed, and bakes
+that 1 into the detection head's Reshape targets as well as the graph input/output.
+This tool marks axis 0 of the graph input and outputs as 'batch' and rewrites a leading 1
+in every constant Reshape target to 0 ("copy this dimension from the input"), which is
+equivalent to re-exporting with dynamic_axes={'images': {0: 'batch'}}. The per-image
+outputs are bit-identical to the fixed-batch model.
+
+With a dynamic batch axis ONNXModelWrapper.detect_batch runs all scan angles of a plant
+in a single forward pass instead of one run per image.
+
+Usage:
+    python -m inference.make_batch_dynamic [SRC_MODEL] [DST_MODEL]
+
+Both paths default to config.STRESS_DETECTOR_FP32_MODEL_PATH (the model is converted in place).
+"""
+
+import logging
+import sys
+import os
+
+import onnx
+from onnx import numpy_helper
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def make_batch_dynamic(src_path: str, dst_path: str) -> bool:
+    """Rewrites `src_path` with a dynamic batch axis and saves it to `dst_path`. Returns False if it already has one."""
+    model = onnx.load(src_path)
+    graph = model.graph
+
+    batch_dims = [value.type.tensor_type.shape.dim[0] for value in (*graph.input, *graph.output)]
+    if not any(dim.HasField("dim_value") for dim in batch_dims):
+        logger.info(f"'{os.path.basename(src_path)}' already has a dynamic batch axis; nothing to do.")
+        return False
+    for dim in batch_dims:
+        dim.dim_param = "batch"
+
+    reshape_targets = {node.input[1] for node in graph.node if node.op_type == "Reshape"}
+    for initializer in graph.initializer:
+        if initializer.name not in reshape_targets:
+            continue
+        target = numpy_helper.to_array(initializer).copy()
+        if target.size and target[0] == 1:
+            target[0] = 0
+            initializer.CopyFrom(numpy_helper.from_array(target, initializer.name))
+            logger.info(f"Reshape target '{initializer.name}' now copies the batch dimension: {target.tolist()}")
+
+    # Intermediate shapes recorded at export time still carry the fixed batch; let ORT re-infer them.
+    del graph.value_info[:]
+
+    onnx.checker.check_model(model)
+    onnx.save(model, dst_path)
+    logger.info(f"Saved dynamic-batch model to '{dst_path}'.")
+    return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    src = sys.argv[1] if len(sys.argv) > 1 else config.STRESS_DETECTOR_FP32_MODEL_PATH
+    dst = sys.argv[2] if len(sys.argv) > 2 else src
+    make_batch_dynamic(src, dst)
@@ -5,16 +5,76 @@ import time
 import cv2
 import numpy as np
 import onnxruntime as ort
-import sys
 import os
-from typing import List, Dict, Tuple
+from dataclasses import dataclass
+from typing import List, Dict, Tuple, Optional, Sequence
 
-# This allows importing the config file from the project root
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
+from inference import _kernels
 
 logger = logging.getLogger(__name__)
 
+# YOLOv8 expects pixels scaled to [0, 1] with no mean/std normalization.
+_PIXEL_SCALE = np.float32(1.0 / 255.0)
+_LETTERBOX_FILL = 114
+_LETTERBOX_FILL_SCALED = np.float32(_LETTERBOX_FILL / 255.0)
+_NMS_IOU_THRESHOLD = 0.45
+_NO_CLASS_IDS = np.empty(0, dtype=np.intp)
+_NO_SCORES = np.empty(0, dtype=np.float32)
+_NO_BOXES = np.empty((0, 4), dtype=np.int32)
+
+
+@dataclass(frozen=True, slots=True)
+class DetectionBatch:
+    """
+    The detections for one image, stored as parallel arrays (highest score first)
+    instead of one dict per detection.
+    """
+    class_ids: np.ndarray  # intp[N]
+    scores: np.ndarray  # float32[N]
+    boxes: np.ndarray  # int32[N, 4] as [left, top, width, height]
+    class_names: Sequence[str]  # The model's class list, shared by every batch.
+
+    def __len__(self) -> int:
+        return self.class_ids.size
+
+    @classmethod
+    def empty(cls, class_names: Sequence[str]) -> "DetectionBatch":
+        return cls(_NO_CLASS_IDS, _NO_SCORES, _NO_BOXES, class_names)
+
+    def names(self) -> List[str]:
+        """The class name of every detection, in order."""
+        class_names = self.class_names
+        return [class_names[class_id] for class_id in self.class_ids.tolist()]
+
+
+
+def _class_nms(boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray, iou_thresh: float) -> np.ndarray:
+    """
+    Greedy non-max suppression run separately for each class, so overlapping stresses of
+    different kinds on the same leaf are all kept. Boxes are (N, 4) [left, top, width, height].
+    Returns the indices of the kept boxes, highest score first.
+    """
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = boxes[:, 2] * boxes[:, 3]
+
+    keep = []
+    for class_id in np.unique(class_ids):
+        order = np.flatnonzero(class_ids == class_id)
+        order = order[np.argsort(-scores[order], kind="stable")]
+        while order.size:
+            best, rest = order[0], order[1:]
+            keep.append(best)
+            inter = (np.maximum(0, np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]))
+                     * np.maximum(0, np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest])))
+            iou = inter / np.maximum(areas[best] + areas[rest] - inter, 1e-9)
+            order = rest[iou <= iou_thresh]
+
+    keep = np.asarray(keep, dtype=np.intp)
+    return keep[np.argsort(-scores[keep], kind="stable")]
+
+
 class ONNXModelWrapper:
     """
     A generic wrapper for running YOLOv8 object detection models in ONNX format.
@@ -37,11 +97,33 @@ class ONNXModelWrapper:
             confidence_thresh (float): The minimum confidence score to consider a detection.
         """
         self.model_path = model_path
+        self._model_basename = os.path.basename(model_path)
         self.input_width, self.input_height = input_size
         self.class_names = class_names
         self.confidence_thresh = confidence_thresh
         self.session = None
         self.is_initialized = False
+        # True when the model was exported with a dynamic batch axis.
+        self.supports_batching = False
+        # True when the model emits (anchors, 4 + classes) instead of YOLOv8's default (4 + classes, anchors).
+        self.anchor_major_output = False
+
+        # The input tensor is allocated once and reused for every frame.
+        self._input_tensor = np.empty((1, 3, self.input_height, self.input_width), dtype=np.float32)
+        self._batch_tensors: Dict[int, np.ndarray] = {}
+        # Single-image runs go through an IO binding over that same tensor; set up once the session exists.
+        self._input_name: Optional[str] = None
+        self._input_ortvalue = None
+        self._output_tensor: Optional[np.ndarray] = None
+        self._io_binding = None
+        # Frame geometry is fixed per camera stream, so the letterbox and box-decoding
+        # constants are computed once per (height, width) and looked up afterwards.
+        self._letterbox_cache: Dict[Tuple[int, int], Tuple[int, int, int, int, int]] = {}
+        self._decode_cache: Dict[Tuple[int, int], Tuple[float, float, float, float]] = {}
+        # Letterbox geometry whose padding bands are currently written in each reused input buffer,
+        # keyed by the buffer's data address. Nothing else writes the bands, so they are only
+        # refilled when the frame geometry for that buffer changes.
+        self._padded_geometry: Dict[int, Tuple[int, int, int, int, int]] = {}
 
         self._initialize_model()
 
@@ -51,113 +133,247 @@ class ONNXModelWrapper:
             logger.critical(f"Model file not found at path: {self.model_path}")
             return
         
-        logger.info(f"Initializing ONNX model from: {os.path.basename(self.model_path)}")
+        logger.info(f"Initializing ONNX model from: {self._model_basename}")
         try:
             # For Raspberry Pi, 'CPUExecutionProvider' is the recommended and most stable option.
             providers = ['CPUExecutionProvider']
-            self.session = ort.InferenceSession(self.model_path, providers=providers)
+            try:
+                self.session = ort.InferenceSession(self.model_path, sess_options=self._build_session_options(self.model_path), providers=providers)
+            except Exception as e:
+                # An .ort file built by a different onnxruntime version will not load; use its source model instead.
+                onnx_path = os.path.splitext(self.model_path)[0] + ".onnx"
+                if not self.model_path.endswith(".ort") or not os.path.exists(onnx_path):
+                    raise
+                logger.warning(f"Could not load ORT-format model '{self._model_basename}' ({e}); falling back to the .onnx model.")
+                self.model_path = onnx_path
+                self._model_basename = os.path.basename(onnx_path)
+                self.session = ort.InferenceSession(onnx_path, sess_options=self._build_session_options(onnx_path), providers=providers)
             
             model_inputs = self.session.get_inputs()
             model_outputs = self.session.get_outputs()
             logger.debug(f"Model inputs: {[inp.name for inp in model_inputs]}")
             logger.debug(f"Model outputs: {[out.name for out in model_outputs]}")
+            # Dynamic axes are reported as a name or None instead of a fixed int.
+            self.supports_batching = not isinstance(model_inputs[0].shape[0], int)
+            self.anchor_major_output = model_outputs[0].shape[-1] == 4 + len(self.class_names)
+            self._input_name = model_inputs[0].name
+
+            # On CPU the OrtValue wraps the numpy buffer without copying, so _preprocess writes
+            # straight into the bound input and each run needs no feed dict or input copy.
+            self._input_ortvalue = ort.OrtValue.ortvalue_from_numpy(self._input_tensor)
+            self._io_binding = self.session.io_binding()
+            self._io_binding.bind_ortvalue_input(self._input_name, self._input_ortvalue)
+            output_dims = model_outputs[0].shape[1:]
+            if all(isinstance(dim, int) for dim in output_dims):
+                # The output also lands in a buffer we own, so no tensor is allocated per run.
+                # _postprocess copies out what it keeps, so the buffer can be reused.
+                self._output_tensor = np.empty((1, *output_dims), dtype=np.float32)
+                self._io_binding.bind_ortvalue_output(
+                    model_outputs[0].name, ort.OrtValue.ortvalue_from_numpy(self._output_tensor)
+                )
+            else:
+                self._io_binding.bind_output(model_outputs[0].name, 'cpu')
             
+            if _kernels.HAVE_NUMBA:
+                # Compile (or load from cache) now rather than on the first plant of a mission.
+                _kernels.warm_up()
+
             self.is_initialized = True
-            logger.info(f"ONNX model '{os.path.basename(self.model_path)}' initialized successfully.")
+            logger.info(f"ONNX model '{self._model_basename}' initialized successfully.")
 
         except Exception as e:
             logger.critical(f"Failed to initialize ONNX model '{self.model_path}': {e}", exc_info=True)
             self.session = None
 
-    def _preprocess(self, image: np.ndarray) -> np.ndarray:
+    @staticmethod
+    def _build_session_options(model_path: str) -> ort.SessionOptions:
         """
-        Prepares an input image for the YOLOv8 model.
+        Session settings for a single-image, single-model pipeline on a small CPU:
+        all graph fusions on, a fixed intra-op pool, and no busy-waiting between runs
+        so idle inference threads do not steal cycles from the rest of the robot.
         """
-        img_height, img_width = image.shape[:2]
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = config.ORT_INTRA_THREADS
+        options.inter_op_num_threads = 1
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        options.add_session_config_entry("session.inter_op.allow_spinning", "0")
+        if model_path.endswith(".ort"):
+            # Pre-optimized flatbuffer: no protobuf parse, and the fusions were applied at conversion time.
+            options.add_session_config_entry("session.load_model_format", "ORT")
+        return options
 
-        ratio = min(self.input_width / img_width, self.input_height / img_height)
-        new_width = int(img_width * ratio)
-        new_height = int(img_height * ratio)
-        resized_img = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    def _letterbox_geometry(self, shape: Tuple[int, int]) -> Tuple[int, int, int, int, int]:
+        """Returns (new_width, new_height, dw, dh, interpolation) for a frame of the given (height, width)."""
+        geometry = self._letterbox_cache.get(shape)
+        if geometry is None:
+            img_height, img_width = shape
+            ratio = min(self.input_width / img_width, self.input_height / img_height)
+            new_width = int(img_width * ratio)
+            new_height = int(img_height * ratio)
+            # Area averaging avoids aliasing when shrinking; bilinear is the better choice for enlarging.
+            interpolation = cv2.INTER_AREA if ratio < 1 else cv2.INTER_LINEAR
+            geometry = (new_width, new_height, (self.input_width - new_width) // 2, (self.input_height - new_height) // 2, interpolation)
+            self._letterbox_cache[shape] = geometry
+        return geometry
 
-        padded_img = np.full((self.input_height, self.input_width, 3), 114, dtype=np.uint8)
-        dw, dh = (self.input_width - new_width) // 2, (self.input_height - new_height) // 2
-        padded_img[dh:dh + new_height, dw:dw + new_width] = resized_img
+    def _decode_constants(self, shape: Tuple[int, int]) -> Tuple[float, float, float, float]:
+        """Returns (x_scale, y_scale, pad_x, pad_y) for mapping boxes back onto a frame of the given (height, width)."""
+        constants = self._decode_cache.get(shape)
+        if constants is None:
+            img_height, img_width = shape
+            x_scale = self.input_width / img_width
+            y_scale = self.input_height / img_height
+            pad_x = (self.input_width - img_width * x_scale) / 2
+            pad_y = (self.input_height - img_height * y_scale) / 2
+            constants = (x_scale, y_scale, pad_x, pad_y)
+            self._decode_cache[shape] = constants
+        return constants
 
-        transposed_img = padded_img.transpose(2, 0, 1)
-        normalized_img = transposed_img / 255.0
-        
-        return np.expand_dims(normalized_img, axis=0).astype(np.float32)
+    def _preprocess(self, image: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Prepares a BGR input image for the YOLOv8 model, which expects RGB.
+        The CHW result is written into `out` (one slot of a batch tensor) if given,
+        otherwise into the single-image input tensor, which is returned.
+        """
+        geometry = self._letterbox_geometry(image.shape[:2])
+        new_width, new_height, dw, dh, interpolation = geometry
+        if (new_height, new_width) == image.shape[:2]:
+            # Already at letterbox size, e.g. a frame scaled by the camera's ISP.
+            resized_img = image
+        else:
+            resized_img = cv2.resize(image, (new_width, new_height), interpolation=interpolation)
+
+        if out is None:
+            out = self._input_tensor[0]
+        bottom, right = dh + new_height, dw + new_width
+
+        # Only the letterbox bands are filled; the content region is fully overwritten below.
+        buffer_address = out.ctypes.data
+        if self._padded_geometry.get(buffer_address) != geometry:
+            out[:, :dh, :] = _LETTERBOX_FILL_SCALED
+            out[:, bottom:, :] = _LETTERBOX_FILL_SCALED
+            out[:, dh:bottom, :dw] = _LETTERBOX_FILL_SCALED
+            out[:, dh:bottom, right:] = _LETTERBOX_FILL_SCALED
+            self._padded_geometry[buffer_address] = geometry
+
+        # BGR -> RGB, HWC -> CHW and scaling in one float32 pass, written straight into the
+        # content region of the input tensor; no padded uint8 canvas is needed.
+        np.multiply(resized_img[..., ::-1].transpose(2, 0, 1), _PIXEL_SCALE, out=out[:, dh:bottom, dw:right], dtype=np.float32)
+
+        return self._input_tensor
 
-    def _postprocess(self, model_output: np.ndarray, original_image_shape: Tuple[int, int]) -> List[Dict]:
+    def _postprocess(self, model_output: np.ndarray, original_image_shape: Tuple[int, int]) -> DetectionBatch:
         """
         Processes the raw output from the YOLOv8 model.
         """
-        outputs = np.transpose(np.squeeze(model_output[0]))
-        
-        rows = outputs.shape[0]
-        boxes, scores, class_ids = [], [], []
-        
-        img_height, img_width = original_image_shape
-        x_scale = self.input_width / img_width
-        y_scale = self.input_height / img_height
-
-        for i in range(rows):
-            classes_scores = outputs[i][4:]
-            max_score = np.amax(classes_scores)
-
-            if max_score >= self.confidence_thresh:
-                class_id = np.argmax(classes_scores)
-                
-                x, y, w, h = outputs[i, 0], outputs[i, 1], outputs[i, 2], outputs[i, 3]
-
-                left = int((x - (w / 2) - ((self.input_width - img_width * x_scale) / 2)) / x_scale)
-                top = int((y - (h / 2) - ((self.input_height - img_height * y_scale) / 2)) / y_scale)
-                width = int(w / x_scale)
-                height = int(h / y_scale)
-                
-                class_ids.append(class_id)
-                scores.append(max_score)
-                boxes.append([left, top, width, height])
-
-        indices = cv2.dnn.NMSBoxes(boxes, np.array(scores), self.confidence_thresh, 0.45)
-        
-        detections = []
-        if len(indices) > 0:
-            for i in indices.flatten():
-                detections.append({
-                    "class_id": class_ids[i],
-                    "class_name": self.class_names[class_ids[i]],
-                    "confidence": float(scores[i]),
-                    "box": boxes[i]
-                })
-        
-        return detections
+        # Work in the channel-major (4 + classes, anchors) layout YOLOv8 exports by default:
+        # each class row is contiguous, so the score reduction streams over unit-stride memory.
+        outputs = model_output[0]
+        if outputs.ndim == 3:
+            outputs = outputs[0]
+        if self.anchor_major_output:
+            outputs = outputs.T
+
+        x_scale, y_scale, pad_x, pad_y = self._decode_constants(original_image_shape)
+
+        if _kernels.HAVE_NUMBA:
+            boxes, scores, class_ids = _kernels.decode_boxes(
+                outputs, self.confidence_thresh, x_scale, y_scale, pad_x, pad_y
+            )
+            if not scores.size:
+                return DetectionBatch.empty(self.class_names)
+            keep = _kernels.class_nms(boxes, scores, class_ids, _NMS_IOU_THRESHOLD)
+        else:
+            # Score filtering over all anchors at once; only the survivors are decoded.
+            max_scores = outputs[4:].max(axis=0)
+            mask = max_scores >= self.confidence_thresh
+            if not mask.any():
+                return DetectionBatch.empty(self.class_names)
 
-    def detect(self, image: np.ndarray) -> List[Dict]:
+            kept = outputs[:, mask]
+            class_ids = kept[4:].argmax(axis=0)
+            scores = max_scores[mask]
+            x, y, w, h = kept[:4]
+
+            left = ((x - w / 2) - pad_x) / x_scale
+            top = ((y - h / 2) - pad_y) / y_scale
+            boxes = np.stack([left, top, w / x_scale, h / y_scale], axis=1)
+
+            keep = _class_nms(boxes, scores, class_ids, _NMS_IOU_THRESHOLD)
+
+        return DetectionBatch(
+            class_ids[keep].astype(np.intp, copy=False),
+            scores[keep],
+            boxes[keep].astype(np.int32),
+            self.class_names,
+        )
+
+    def detect(self, image: np.ndarray) -> DetectionBatch:
         """
         The main public method for performing object detection.
         """
         if not self.is_initialized or self.session is None:
             logger.error("Cannot perform detection, model is not initialized.")
-            return []
+            return DetectionBatch.empty(self.class_names)
         
         original_shape = image.shape[:2]
         
-        preprocessed_image = self._preprocess(image)
-        
-        model_inputs = self.session.get_inputs()
-        input_name = model_inputs[0].name
+        self._preprocess(image)
         
+        # Timing is only taken when it will be logged.
+        timed = logger.isEnabledFor(logging.DEBUG)
         try:
-            start_time = time.perf_counter()
-            outputs = self.session.run(None, {input_name: preprocessed_image})
-            inference_time = (time.perf_counter() - start_time) * 1000
-            logger.debug(f"Inference on '{os.path.basename(self.model_path)}' took {inference_time:.2f} ms")
+            if timed:
+                start_time = time.perf_counter()
+            self.session.run_with_iobinding(self._io_binding)
+            if self._output_tensor is not None:
+                outputs = (self._output_tensor,)
+            else:
+                outputs = (self._io_binding.get_outputs()[0].numpy(),)
+            if timed:
+                inference_time = (time.perf_counter() - start_time) * 1000
+                logger.debug(f"Inference on '{self._model_basename}' took {inference_time:.2f} ms")
         except Exception as e:
             logger.error(f"Error during model inference: {e}", exc_info=True)
-            return []
+            return DetectionBatch.empty(self.class_names)
 
         detections = self._postprocess(outputs, original_shape)
         
-        return detections
\ No newline at end of file
+        return detections
+
+    def detect_batch(self, images: List[np.ndarray]) -> List[DetectionBatch]:
+        """
+        Performs object detection on several images, returning one DetectionBatch per image.
+        Models with a dynamic batch axis run a single forward pass; fixed-batch models
+        fall back to one run per image.
+        """
+        if not images:
+            return []
+        if not self.is_initialized or self.session is None:
+            logger.error("Cannot perform detection, model is not initialized.")
+            return [DetectionBatch.empty(self.class_names) for _ in images]
+        if not self.supports_batching or len(images) == 1:
+            return [self.detect(image) for image in images]
+
+        batch_tensor = self._batch_tensors.get(len(images))
+        if batch_tensor is None:
+            batch_tensor = np.empty((len(images), 3, self.input_height, self.input_width), dtype=np.float32)
+            self._batch_tensors[len(images)] = batch_tensor
+        for i, image in enumerate(images):
+            self._preprocess(image, out=batch_tensor[i])
+
+        timed = logger.isEnabledFor(logging.DEBUG)
+        try:
+            if timed:
+                start_time = time.perf_counter()
+            outputs = self.session.run(None, {self._input_name: batch_tensor})
+            if timed:
+                inference_time = (time.perf_counter() - start_time) * 1000
+                logger.debug(f"Batched inference of {len(images)} images on '{self._model_basename}' took {inference_time:.2f} ms")
+        except Exception as e:
+            logger.error(f"Error during batched model inference: {e}", exc_info=True)
+            return [DetectionBatch.empty(self.class_names) for _ in images]
+
+        return [self._postprocess((outputs[0][i],), image.shape[:2]) for i, image in enumerate(images)]
@@ -0,0 +1,113 @@
+# inference/quantize_model.py
+
+"""
+Builds the INT8 (QDQ) version of the stress detection model.
+
+Static quantization needs representative inputs, so calibration frames are read from
+an image directory (by default the detection images the robot has already captured in
+the field) and run through the same letterbox pre-processing used at inference time.
+Once the INT8 model exists at config.STRESS_DETECTOR_INT8_MODEL_PATH it is picked up
+automatically on the next start.
+
+Usage:
+    python -m inference.quantize_model [CALIBRATION_IMAGE_DIR] [MAX_IMAGES]
+"""
+
+import glob
+import logging
+import sys
+import os
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+import cv2
+import numpy as np
+import onnx
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+import config
+from inference.onnx_model_wrapper import ONNXModelWrapper
+
+logger = logging.getLogger(__name__)
+
+_IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+DEFAULT_CALIBRATION_IMAGES = 200
+# The YOLOv8 detection head. Its cv2/cv3 conv branches quantize fine, but the decode after
+# them ends in one Concat of pixel box coordinates and 0-1 class scores: with a single
+# INT8 scale for that tensor every class score rounds to zero.
+_HEAD_PREFIX = "/model.22/"
+_HEAD_CONV_PREFIXES = ("/model.22/cv2", "/model.22/cv3")
+
+
+class FieldImageCalibrationReader(CalibrationDataReader):
+    """Feeds pre-processed field images to the ONNX Runtime calibrator, one at a time."""
+
+    def __init__(self, wrapper: ONNXModelWrapper, image_paths: List[str]):
+        self.wrapper = wrapper
+        self.input_name = wrapper.session.get_inputs()[0].name
+        self._paths: Iterator[str] = iter(image_paths)
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        for path in self._paths:
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is None:
+                logger.warning(f"Skipping unreadable calibration image: {path}")
+                continue
+            # _preprocess reuses one input tensor, so each sample needs its own copy.
+            return {self.input_name: self.wrapper._preprocess(image).copy()}
+        return None
+
+
+def _head_decode_nodes(model_path: str) -> List[str]:
+    """Names of the detection head's decode nodes, which are kept in FP32."""
+    graph = onnx.load(model_path, load_external_data=False).graph
+    return [node.name for node in graph.node
+            if node.name.startswith(_HEAD_PREFIX) and not node.name.startswith(_HEAD_CONV_PREFIXES)]
+
+
+def quantize_stress_detector(image_dir: str, max_images: int = DEFAULT_CALIBRATION_IMAGES) -> bool:
+    """Quantizes the FP32 stress detector to INT8 QDQ with per-channel weights."""
+    image_paths = sorted(p for pattern in _IMAGE_PATTERNS for p in glob.glob(os.path.join(image_dir, pattern)))
+    if not image_paths:
+        logger.error(f"No calibration images found in '{image_dir}'.")
+        return False
+    # Spread the sample over the whole directory rather than taking the first few missions.
+    step = max(1, len(image_paths) // max_images)
+    image_paths = image_paths[::step][:max_images]
+
+    wrapper = ONNXModelWrapper(
+        model_path=config.STRESS_DETECTOR_FP32_MODEL_PATH,
+        input_size=config.STRESS_MODEL_INPUT_SIZE,
+        class_names=config.STRESS_CLASS_NAMES,
+        confidence_thresh=config.INFERENCE_CONFIDENCE_THRESHOLD,
+    )
+    if not wrapper.is_initialized:
+        return False
+
+    logger.info(f"Calibrating on {len(image_paths)} images from '{image_dir}'...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Shape inference and graph cleanup let the quantizer cover more of the graph.
+        # ONNX Runtime's symbolic pass cannot complete on this graph, and ONNX's own shape
+        # inference already carries the symbolic batch axis through to every tensor.
+        prepared_path = os.path.join(tmp_dir, "prepared.onnx")
+        quant_pre_process(config.STRESS_DETECTOR_FP32_MODEL_PATH, prepared_path, skip_symbolic_shape=True)
+        quantize_static(
+            prepared_path,
+            config.STRESS_DETECTOR_INT8_MODEL_PATH,
+            FieldImageCalibrationReader(wrapper, image_paths),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            nodes_to_exclude=_head_decode_nodes(prepared_path),
+        )
+    logger.info(f"INT8 model saved to '{config.STRESS_DETECTOR_INT8_MODEL_PATH}'.")
+    return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    calibration_dir = sys.argv[1] if len(sys.argv) > 1 else config.CAPTURED_IMAGES_DATA_PATH
+    max_images = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_CALIBRATION_IMAGES
+    sys.exit(0 if quantize_stress_detector(calibration_dir, max_images) else 1)
@@ -1,14 +1,11 @@
 # inference/stress_detector.py
 
 import logging
-import sys
-import os
-from typing import List, Dict, Optional
+from typing import Optional, Tuple
+import numpy as np
 
-# This allows importing from the parent directory (project root)
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
-from inference.onnx_model_wrapper import ONNXModelWrapper
+from inference.onnx_model_wrapper import ONNXModelWrapper, DetectionBatch
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +34,7 @@ class StressDetector(ONNXModelWrapper):
         else:
             logger.error("Failed to initialize Stress Detector.")
 
-    def get_primary_stress(self, detections: List[Dict]) -> Optional[Dict]:
+    def get_primary_stress(self, detections: DetectionBatch) -> Optional[Tuple[int, float, np.ndarray]]:
         """
         A helper method to identify the most significant stress from a list of detections.
         
@@ -46,16 +43,16 @@ class StressDetector(ONNXModelWrapper):
         stresses might be visible on a plant.
 
         Args:
-            detections (List[Dict]): A list of detection dictionaries from the detect() method.
+            detections (DetectionBatch): The detections returned by the detect() method.
 
         Returns:
-            Optional[Dict]: The dictionary of the highest-confidence stress detection,
-                            or None if no stresses were detected.
+            Optional[Tuple[int, float, np.ndarray]]: The (class_id, confidence, box) of the
+                            highest-confidence stress detection, or None if no stresses were detected.
         """
-        if not detections:
+        if not len(detections):
             return None
 
         # Find and return the detection with the maximum confidence score.
-        primary_stress = max(detections, key=lambda det: det['confidence'])
+        i = int(detections.scores.argmax())
         
-        return primary_stress
\ No newline at end of file
+        return int(detections.class_ids[i]), float(detections.scores[i]), detections.boxes[i]
\ No newline at end of file
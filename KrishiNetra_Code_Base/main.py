@@ -32,7 +32,7 @@ def run_flask_app(app, host, port):
 
     try:
         from waitress import serve
-        serve(app, host=host, port=port, threads=8)
+        serve(app, host=host, port=port, threads=config.WEB_SERVER_THREADS)
     except ImportError:
         logger.warning("Waitress not installed. Using Flask dev server.")
         app.run(host=host, port=port, debug=False, use_reloader=False)
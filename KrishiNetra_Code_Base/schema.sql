@@ -40,3 +40,8 @@ CREATE TABLE detections (
 -- for fetching session-specific data and ordering results, which are common operations
 -- for the summary dashboard.
 CREATE INDEX idx_mission_timestamp ON detections (mission_id, timestamp);
+
+-- Covering indexes for the per-mission analytics: the detection summary groups by
+-- stress class, and the per-plant bar chart and health index group by plant then class.
+CREATE INDEX idx_det_mission ON detections (mission_id, plant_number, stress_detected);
+CREATE INDEX idx_det_mission_stress ON detections (mission_id, stress_detected);
@@ -3,19 +3,19 @@
 import serial
 import time
 import threading
-from queue import Queue, Empty
+from collections import deque
 import logging
-import sys
-import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Deque
 
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
+from services.cpu_affinity import pin_current_thread
 
 logger = logging.getLogger(__name__)
 
 class ArduinoCommunicator:
-    def __init__(self, port: str, baud_rate: int, timeout: float = 1.0, name: str = "Arduino"):
+    def __init__(self, port: str, baud_rate: int, timeout: float = 0.1, name: str = "Arduino"):
+        # `timeout` is the serial read timeout; it bounds how long the blocking reader
+        # takes to notice a shutdown request, not how long commands wait for replies.
         self.port = port
         self.baud_rate = baud_rate
         self.timeout = timeout
@@ -24,8 +24,14 @@ class ArduinoCommunicator:
         self.is_connected: bool = False
         self._reader_thread: Optional[threading.Thread] = None
         self._shutdown_event = threading.Event()
-        self._message_queue: Queue = Queue()
+        # Reader -> command-thread replies. Single producer, single consumer (under _lock), so the
+        # GIL-atomic deque append/popleft need no lock of their own; the event only wakes a waiter.
+        self._message_queue: Deque[Dict] = deque(maxlen=256)
+        self._message_ready = threading.Event()
         self._lock = threading.Lock()
+        # Unsolicited <DONE:...> events, keyed as "DONE:<NAME>" and kept out of the reply queue.
+        self._events: Dict[str, Dict] = {}
+        self._event_cond = threading.Condition()
 
     def connect(self) -> bool:
         if self.is_connected:
@@ -66,17 +72,33 @@ class ArduinoCommunicator:
 
     def _reader_thread_loop(self):
         logger.info(f"[{self.name}] Reader thread started.")
+        pin_current_thread(config.SERIAL_READER_CPU_CORES, f"{self.name} reader")
+        pending = b""
         while not self._shutdown_event.is_set():
             try:
-                if self.serial_connection and self.serial_connection.in_waiting > 0:
-                    raw_message = self.serial_connection.read_until(b'>').decode('utf-8').strip()
-                    if raw_message:
+                # Blocks in the kernel until a '>' arrives or the read timeout expires,
+                # so the thread only wakes for data or to check for shutdown.
+                chunk = self.serial_connection.read_until(b'>')
+                if not chunk:
+                    continue
+                if not chunk.endswith(b'>'):
+                    # Timed out mid-message; keep the fragment for the next read.
+                    pending += chunk
+                    continue
+                frame, pending = pending + chunk, b""
+                # Resync on the last '<' so line noise before a message is dropped with it.
+                start = frame.rfind(b'<')
+                if start >= 0:
+                    raw_message = frame[start:].decode('utf-8', errors='replace')
+                    if logger.isEnabledFor(logging.DEBUG):
                         logger.debug(f"[{self.name}] Raw Rx: {raw_message}")
-                        parsed = self._parse_message(raw_message)
-                        if parsed: self._message_queue.put(parsed)
-                else:
-                    time.sleep(0.01)
-            except (serial.SerialException, TypeError, UnicodeDecodeError) as e:
+                    parsed = self._parse_message(raw_message)
+                    if parsed and parsed["type"] == "DONE":
+                        self._record_event(parsed)
+                    elif parsed:
+                        self._message_queue.append(parsed)
+                        self._message_ready.set()
+            except (serial.SerialException, TypeError, AttributeError) as e:
                 logger.warning(f"[{self.name}] Error in reader thread: {e}")
                 self.is_connected = False
                 break
@@ -85,16 +107,13 @@ class ArduinoCommunicator:
     def _parse_message(self, message: str) -> Optional[Dict]:
         if not message.startswith('<') or not message.endswith('>'):
             return None
-        content = message[1:-1]
-        parts = content.split(':', 1)
-        msg_type = parts[0]
-        msg_payload_str = parts[1] if len(parts) > 1 else ""
+        msg_type, _, msg_payload_str = message[1:-1].partition(':')
         
         payload = {}
         if msg_type == "DATA" and msg_payload_str.startswith("SENSORS:"):
-            payload_str = msg_payload_str.replace("SENSORS:", "")
             try:
-                for item in payload_str.split(','):
+                # "SENSORS:K1:v1,K2:v2,..."; slicing off the prefix avoids a scan-and-copy with replace().
+                for item in msg_payload_str[8:].split(','):
                     key, value_str = item.split(':')
                     try:
                         payload[key] = float(value_str) if '.' in value_str else int(value_str)
@@ -105,23 +124,61 @@ class ArduinoCommunicator:
         
         return {"type": msg_type, "payload_str": msg_payload_str, "payload": payload}
 
+    def _record_event(self, message: Dict):
+        event_name = f"DONE:{message['payload_str'].split(':', 1)[0]}"
+        with self._event_cond:
+            self._events[event_name] = message
+            self._event_cond.notify_all()
+
+    def clear_event(self, event_name: str):
+        """Forgets a previously received event. Call before sending the command that triggers it."""
+        with self._event_cond:
+            self._events.pop(event_name, None)
+
+    def wait_for_event(self, event_name: str, timeout: float) -> Optional[Dict]:
+        """Blocks until the reader thread delivers the named event, returning its message or None on timeout."""
+        with self._event_cond:
+            if self._event_cond.wait_for(lambda: event_name in self._events, timeout=timeout):
+                return self._events.pop(event_name)
+        logger.warning(f"[{self.name}] Timeout waiting for event: {event_name}")
+        return None
+
+    def send_command_await(self, command: str, event_name: str, timeout: float) -> Optional[Dict]:
+        """Sends a command and blocks until its completion event arrives, returning it or None on timeout."""
+        self.clear_event(event_name)
+        if not self.send_command(command, expect_ack=False):
+            return None
+        return self.wait_for_event(event_name, timeout)
+
+    def _next_message(self, deadline: float) -> Optional[Dict]:
+        """Pops the next reply from the reader, waiting until the monotonic deadline. Returns None on timeout."""
+        while True:
+            try:
+                return self._message_queue.popleft()
+            except IndexError:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self._message_ready.clear()
+            # Re-check after clearing so a reply appended in between is not slept through.
+            if not self._message_queue:
+                self._message_ready.wait(remaining)
+
     def send_command(self, command: str, expect_ack: bool = True, timeout: float = 2.0) -> bool:
         if not self.is_connected or not self.serial_connection: return False
         full_command = f"<{command}>"
         with self._lock:
             try:
                 self.serial_connection.write(full_command.encode('utf-8'))
-                logger.debug(f"[{self.name}] Tx: {command}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[{self.name}] Tx: {command}")
                 if not expect_ack: return True
                 
-                start_time = time.time()
-                while time.time() - start_time < timeout:
-                    try:
-                        msg = self._message_queue.get(timeout=0.1)
-                        if msg.get('type') == 'ACK':
-                            return True
-                    except Empty:
-                        continue
+                deadline = time.monotonic() + timeout
+                while (msg := self._next_message(deadline)) is not None:
+                    if msg.get('type') == 'ACK':
+                        return True
                 logger.warning(f"[{self.name}] Timeout waiting for ACK for command: {command}")
                 return False
             except serial.SerialException as e:
@@ -133,28 +190,21 @@ class ArduinoCommunicator:
     def get_sensors(self, timeout: float = 0.5) -> Optional[Dict]:
         if not self.is_connected or not self.serial_connection: return None
         with self._lock:
-            while not self._message_queue.empty():
-                try: self._message_queue.get_nowait()
-                except Empty: break
+            self._message_queue.clear()
             
             try:
                 self.serial_connection.write(b'<get_data>')
-                logger.debug(f"[{self.name}] Tx: get_data")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[{self.name}] Tx: get_data")
             except serial.SerialException as e:
                 logger.error(f"[{self.name}] Serial error during get_sensors write: {e}")
                 self.disconnect()
                 return None
 
-            start_time = time.time()
-            while time.time() - start_time < timeout:
-                try:
-                    msg = self._message_queue.get(timeout=0.1)
-                    if msg.get('type') == 'DATA' and msg.get('payload_str', '').startswith('SENSORS:'):
-                        return msg['payload']
-                    else:
-                        continue
-                except Empty:
-                    continue
+            deadline = time.monotonic() + timeout
+            while (msg := self._next_message(deadline)) is not None:
+                if msg.get('type') == 'DATA' and msg.get('payload_str', '').startswith('SENSORS:'):
+                    return msg['payload']
         logger.warning(f"[{self.name}] Timeout waiting for SENSOR data response.")
         return None
     
@@ -0,0 +1,28 @@
+# services/cpu_affinity.py
+
+import logging
+import os
+from typing import AbstractSet
+
+logger = logging.getLogger(__name__)
+
+
+def pin_current_thread(cores: AbstractSet[int], label: str) -> bool:
+    """
+    Restricts the calling thread to the given CPU cores, keeping latency-sensitive
+    threads (serial readers) and heavy ones (inference) from competing for the same core.
+    Cores the process may not use are ignored; returns False if nothing was pinned.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return False
+    allowed = set(cores) & os.sched_getaffinity(0)
+    if not allowed:
+        return False
+    try:
+        # On Linux, pid 0 targets only the calling thread, not the whole process.
+        os.sched_setaffinity(0, allowed)
+    except OSError as e:
+        logger.warning(f"Could not pin the {label} thread to cores {sorted(allowed)}: {e}")
+        return False
+    logger.debug(f"Pinned the {label} thread to cores {sorted(allowed)}.")
+    return True
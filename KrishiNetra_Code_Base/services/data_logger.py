@@ -1,12 +1,12 @@
 # services/data_logger.py
 
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 import os
+import queue
 import sys
 
-# This allows importing the config file from the project root
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
 
 def setup_logging():
@@ -16,6 +16,9 @@ def setup_logging():
     This function sets up a sophisticated logging system that outputs logs
     to both the console and two separate, rotating log files: one for general
     information and another exclusively for errors and warnings.
+
+    The root logger only enqueues records; a background QueueListener thread does
+    the console and SD-card writes, so logging never blocks the robot's threads on I/O.
     """
     log_dir = os.path.dirname(config.LOG_FILE_PATH)
     os.makedirs(log_dir, exist_ok=True)
@@ -36,7 +39,6 @@ def setup_logging():
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
     console_handler.setFormatter(log_format)
-    root_logger.addHandler(console_handler)
 
     # --- 2. Main Rotating File Handler ---
     info_file_handler = RotatingFileHandler(
@@ -47,7 +49,6 @@ def setup_logging():
     )
     info_file_handler.setLevel(logging.INFO)
     info_file_handler.setFormatter(log_format)
-    root_logger.addHandler(info_file_handler)
 
     # --- 3. Error Rotating File Handler ---
     error_file_handler = RotatingFileHandler(
@@ -58,7 +59,16 @@ def setup_logging():
     )
     error_file_handler.setLevel(logging.WARNING)
     error_file_handler.setFormatter(log_format)
-    root_logger.addHandler(error_file_handler)
+
+    # --- Hand the three handlers to a single writer thread ---
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root_logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(
+        log_queue, console_handler, info_file_handler, error_file_handler, respect_handler_level=True
+    )
+    listener.start()
+    # Flushes whatever is still queued when the process exits.
+    atexit.register(listener.stop)
 
     root_logger.info("--------------------------------------------------")
     root_logger.info(f"Logging for '{config.PROJECT_NAME}' initialized.")
@@ -3,16 +3,45 @@
 import sqlite3
 import logging
 import os
-import sys
-from typing import List, Dict, Any, Optional
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 
-# This allows importing the config file from the project root
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
 
 logger = logging.getLogger(__name__)
 
-def get_db_connection() -> sqlite3.Connection:
+# Applied to every new connection, including the one init_db builds the schema on.
+# WAL lets the dashboard read while the robot writes, and synchronous=NORMAL only syncs
+# at checkpoints instead of on every commit. journal_mode is stored in the database file;
+# the others are per-connection. The 256 MB mmap window is address space, not RAM.
+_CONNECTION_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-65536;
+"""
+
+# Connections stay open for the life of the thread that uses them, so SQLite's page
+# cache survives between queries. Writes go through one shared connection under a lock.
+_local = threading.local()
+_write_lock = threading.Lock()
+_write_conn: Optional[sqlite3.Connection] = None
+
+# Indexes added to schema.sql after the first databases were created in the field.
+# The per-mission analytics filter on mission_id and group by plant and stress class.
+_DETECTION_INDEXES_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_det_mission ON detections (mission_id, plant_number, stress_detected);
+    CREATE INDEX IF NOT EXISTS idx_det_mission_stress ON detections (mission_id, stress_detected);
+"""
+
+_INSERT_DETECTION_SQL = ''' INSERT INTO detections(mission_id, plant_number, scan_angle, stress_detected, confidence, image_path)
+              VALUES(?,?,?,?,?,?) '''
+
+
+def _open_connection() -> sqlite3.Connection:
     """
     Establishes a connection to the SQLite database.
     Configures the connection to return rows that behave like dictionaries.
@@ -20,12 +49,39 @@ def get_db_connection() -> sqlite3.Connection:
     try:
         conn = sqlite3.connect(config.DATABASE_PATH, check_same_thread=False)
         conn.row_factory = sqlite3.Row # Allows accessing columns by name
+        conn.executescript(_CONNECTION_PRAGMAS)
         return conn
     except sqlite3.Error as e:
         logger.critical(f"Database connection failed: {e}", exc_info=True)
         raise
 
 
+def get_db_connection() -> sqlite3.Connection:
+    """
+    Returns the calling thread's connection, opening it on first use.
+    The connection is cached for the thread's lifetime, so callers must not close it.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _open_connection()
+        _local.conn = conn
+    return conn
+
+
+@contextmanager
+def _write_transaction() -> Iterator[sqlite3.Connection]:
+    """
+    Yields the shared write connection inside a transaction. Holding the write lock means
+    the writer threads queue up here instead of on SQLite's busy timeout.
+    """
+    global _write_conn
+    with _write_lock:
+        if _write_conn is None:
+            _write_conn = _open_connection()
+        with _write_conn:
+            yield _write_conn
+
+
 def init_db():
     """
     Initializes the database using schema.sql, but ONLY if the database file
@@ -34,38 +90,69 @@ def init_db():
     # The fix is to only create the database if the file does not exist.
     if os.path.exists(config.DATABASE_PATH):
         logger.info(f"Database already exists at {config.DATABASE_PATH}. Skipping initialization.")
+        _migrate_indexes()
         return
 
     # If the file doesn't exist, create it from the schema.
     try:
         logger.warning(f"Database not found. Creating new database at {config.DATABASE_PATH}")
-        conn = get_db_connection()
         schema_path = os.path.join(config.PROJECT_ROOT, 'schema.sql')
-        with open(schema_path, 'r') as f:
+        with open(schema_path, 'r') as f, _write_transaction() as conn:
             conn.executescript(f.read())
-        conn.commit()
-        conn.close()
         logger.info("Database initialized successfully.")
     except FileNotFoundError:
         logger.critical(f"CRITICAL: schema.sql not found at {schema_path}. Cannot initialize database.")
     except sqlite3.Error as e:
         logger.critical(f"Database initialization failed: {e}", exc_info=True)
-        
+
+
+def _migrate_indexes():
+    """
+    Adds the analytics indexes to a database created before they were part of schema.sql,
+    then runs ANALYZE once so the query planner has statistics for them.
+    """
+    try:
+        with _write_transaction() as conn:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_det_mission'").fetchone():
+                return
+            logger.info("Adding analytics indexes to the existing database...")
+            conn.executescript(_DETECTION_INDEXES_SQL + "ANALYZE;")
+    except sqlite3.Error as e:
+        logger.error(f"Could not add analytics indexes: {e}", exc_info=True)
+
 
 def log_detection(mission_id: str, plant_number: int, scan_angle: str, stress_detected: str, confidence: float, image_path: str):
     """
-    Logs a single detection event to the new 'detections' table.
+    Logs a single detection event to the 'detections' table.
+    The controller batches a plant's detections through log_detections_bulk instead.
     """
-    sql = ''' INSERT INTO detections(mission_id, plant_number, scan_angle, stress_detected, confidence, image_path)
-              VALUES(?,?,?,?,?,?) '''
+    log_detections_bulk([(mission_id, plant_number, scan_angle, stress_detected, confidence, image_path)])
+
+
+def log_detections_bulk(rows: List[Tuple[Optional[str], int, str, str, float, Optional[str]]]):
+    """
+    Logs several detection events in a single transaction.
+    Each row is (mission_id, plant_number, scan_angle, stress_detected, confidence, image_path).
+    """
+    if not rows:
+        return
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(sql, (mission_id, plant_number, scan_angle, stress_detected, confidence, image_path))
-        conn.commit()
-        conn.close()
+        with _write_transaction() as conn:
+            conn.executemany(_INSERT_DETECTION_SQL, rows)
     except sqlite3.Error as e:
-        logger.error(f"Failed to log detection to database: {e}", exc_info=True)
+        logger.error(f"Failed to log {len(rows)} detections to database: {e}", exc_info=True)
+
+
+def _fetch_dicts(conn: sqlite3.Connection, query: str, params: Tuple = ()) -> List[Dict[str, Any]]:
+    """
+    Runs a read query and returns its rows as plain dicts ready for jsonify.
+    The cursor returns bare tuples, so no intermediate sqlite3.Row is built per row.
+    """
+    cur = conn.cursor()
+    cur.row_factory = None
+    cur.execute(query, params)
+    columns = [column[0] for column in cur.description]
+    return [dict(zip(columns, row)) for row in cur]
 
 
 def get_latest_mission_id(exclude_id: Optional[str] = None) -> Optional[str]:
@@ -77,125 +164,135 @@ def get_latest_mission_id(exclude_id: Optional[str] = None) -> Optional[str]:
     query = "SELECT mission_id FROM detections WHERE (?1 IS NULL OR mission_id != ?1) GROUP BY mission_id ORDER BY MAX(timestamp) DESC LIMIT 1"
     
     try:
-        mission = conn.execute(query, (exclude_id,)).fetchone()
+        with conn:
+            mission = conn.execute(query, (exclude_id,)).fetchone()
         return mission['mission_id'] if mission else None
     except sqlite3.Error as e:
         logger.error(f"Could not query for latest mission ID: {e}")
         return None
-    finally:
-        conn.close()
 
 
 def get_previous_session_analytics(mission_id: str) -> Dict[str, Any]:
     """
     Gathers all statistics and data points for a specific previous mission.
+    Results are cached until a new detection is logged for that mission; callers must not modify them.
     """
     if not mission_id:
         return {"error": "No mission ID provided."}
-        
+
+    conn = get_db_connection()
+    with conn:
+        version = conn.execute("SELECT MAX(id) FROM detections WHERE mission_id = ?", (mission_id,)).fetchone()[0]
+    return _previous_session_analytics(mission_id, version)
+
+
+@lru_cache(maxsize=64)
+def _previous_session_analytics(mission_id: str, version: Optional[int]) -> Dict[str, Any]:
+    """Runs the analytics queries for one mission. `version` is its newest detection id and only keys the cache."""
     conn = get_db_connection()
     
-    header_query = """
-        SELECT
-            MIN(timestamp) as start_time, MAX(timestamp) as end_time,
-            COUNT(DISTINCT plant_number) as total_plants_scanned
-        FROM detections WHERE mission_id = ?
-    """
-    header_data = conn.execute(header_query, (mission_id,)).fetchone()
-    
-    summary_query = "SELECT stress_detected, COUNT(*) as count FROM detections WHERE mission_id = ? GROUP BY stress_detected ORDER BY count DESC"
-    summary_data = conn.execute(summary_query, (mission_id,)).fetchall()
-    
-    plant_bar_chart_query = """
-        SELECT plant_number, stress_detected, COUNT(*) as count
-        FROM detections WHERE mission_id = ? AND stress_detected != 'Healthy'
-        GROUP BY plant_number, stress_detected ORDER BY plant_number
-    """
-    plant_bar_chart_data = conn.execute(plant_bar_chart_query, (mission_id,)).fetchall()
+    with conn:
+        header_query = """
+            SELECT
+                MIN(timestamp) as start_time, MAX(timestamp) as end_time,
+                COUNT(DISTINCT plant_number) as total_plants_scanned
+            FROM detections WHERE mission_id = ?
+        """
+        header_data = _fetch_dicts(conn, header_query, (mission_id,))[0]
 
-    conn.close()
+        summary_query = "SELECT stress_detected, COUNT(*) as count FROM detections WHERE mission_id = ? GROUP BY stress_detected ORDER BY count DESC"
+        summary_data = _fetch_dicts(conn, summary_query, (mission_id,))
 
-    total_plants = header_data['total_plants_scanned'] if header_data and header_data['total_plants_scanned'] else 0
+        plant_bar_chart_query = """
+            SELECT plant_number, stress_detected, COUNT(*) as count
+            FROM detections WHERE mission_id = ? AND stress_detected != 'Healthy'
+            GROUP BY plant_number, stress_detected ORDER BY plant_number
+        """
+        plant_bar_chart_data = _fetch_dicts(conn, plant_bar_chart_query, (mission_id,))
+
+    total_plants = header_data['total_plants_scanned'] or 0
     health_index = 100.0
     if total_plants > 0:
-        conn = get_db_connection()
-        diseased_plants_query = "SELECT COUNT(DISTINCT plant_number) as count FROM detections WHERE mission_id = ? AND stress_detected != 'Healthy'"
-        diseased_plants_count = conn.execute(diseased_plants_query, (mission_id,)).fetchone()['count']
-        conn.close()
-        
+        # The bar chart rows already cover every non-healthy plant of the mission.
+        diseased_plants_count = len({row['plant_number'] for row in plant_bar_chart_data})
         healthy_plants_count = total_plants - diseased_plants_count
         health_index = (healthy_plants_count / total_plants) * 100
 
     return {
-        "header_stats": dict(header_data) if header_data else {},
-        "detection_summary": [dict(row) for row in summary_data],
-        "plant_disease_data": [dict(row) for row in plant_bar_chart_data],
+        "header_stats": header_data,
+        "detection_summary": summary_data,
+        "plant_disease_data": plant_bar_chart_data,
         "health_index": round(health_index, 1)
     }
 
 def get_overall_analytics() -> Dict[str, Any]:
     """
     Gathers aggregated statistics across all missions recorded in the database.
+    Results are cached until the next detection is logged; callers must not modify them.
     """
     conn = get_db_connection()
+    with conn:
+        version = conn.execute("SELECT MAX(id) FROM detections").fetchone()[0]
+    return _overall_analytics(version)
+
+
+@lru_cache(maxsize=1)
+def _overall_analytics(version: Optional[int]) -> Dict[str, Any]:
+    """Runs the cross-mission analytics queries. `version` is the newest detection id and only keys the cache."""
+    conn = get_db_connection()
     
-    agg_query = """
-        SELECT
-            COUNT(DISTINCT mission_id) as total_missions,
-            COUNT(DISTINCT mission_id || '-' || plant_number) as total_plants_scanned,
-            SUM(CASE WHEN stress_detected != 'Healthy' THEN 1 ELSE 0 END) as total_detections
-        FROM detections
-    """
-    agg_data = conn.execute(agg_query).fetchone()
-
-    overall_summary_query = "SELECT stress_detected, COUNT(*) as count FROM detections GROUP BY stress_detected ORDER BY count DESC"
-    overall_summary = conn.execute(overall_summary_query).fetchall()
-
-    session_health_query = """
-        WITH SessionPlants AS (SELECT DISTINCT mission_id, plant_number, DATE(timestamp) as mission_date FROM detections),
-        DiseasedPlants AS (SELECT DISTINCT mission_id, plant_number FROM detections WHERE stress_detected != 'Healthy')
-        SELECT sp.mission_id, sp.mission_date,
-               COUNT(sp.plant_number) - COUNT(dp.plant_number) as healthy_count,
-               COUNT(dp.plant_number) as diseased_count
-        FROM SessionPlants sp LEFT JOIN DiseasedPlants dp ON sp.mission_id = dp.mission_id AND sp.plant_number = dp.plant_number
-        GROUP BY sp.mission_id ORDER BY sp.mission_date
-    """
-    session_health_data = conn.execute(session_health_query).fetchall()
-
-    trend_query = """
-        SELECT DATE(timestamp) as date, stress_detected, COUNT(*) as count
-        FROM detections WHERE stress_detected != 'Healthy'
-        GROUP BY date, stress_detected ORDER BY date
-    """
-    trend_data = conn.execute(trend_query).fetchall()
-    conn.close()
-
-    total_plants = agg_data['total_plants_scanned'] if agg_data else 0
+    with conn:
+        agg_query = """
+            SELECT
+                COUNT(DISTINCT mission_id) as total_missions,
+                (SELECT COUNT(*) FROM (SELECT DISTINCT mission_id, plant_number FROM detections)) as total_plants_scanned,
+                SUM(CASE WHEN stress_detected != 'Healthy' THEN 1 ELSE 0 END) as total_detections,
+                (SELECT COUNT(*) FROM (SELECT DISTINCT mission_id, plant_number FROM detections WHERE stress_detected != 'Healthy')) as total_diseased_plants
+            FROM detections
+        """
+        final_agg_data = _fetch_dicts(conn, agg_query)[0]
+
+        overall_summary_query = "SELECT stress_detected, COUNT(*) as count FROM detections GROUP BY stress_detected ORDER BY count DESC"
+        overall_summary = _fetch_dicts(conn, overall_summary_query)
+
+        session_health_query = """
+            WITH SessionPlants AS (SELECT DISTINCT mission_id, plant_number, DATE(timestamp) as mission_date FROM detections),
+            DiseasedPlants AS (SELECT DISTINCT mission_id, plant_number FROM detections WHERE stress_detected != 'Healthy')
+            SELECT sp.mission_id, sp.mission_date,
+                   COUNT(sp.plant_number) - COUNT(dp.plant_number) as healthy_count,
+                   COUNT(dp.plant_number) as diseased_count
+            FROM SessionPlants sp LEFT JOIN DiseasedPlants dp ON sp.mission_id = dp.mission_id AND sp.plant_number = dp.plant_number
+            GROUP BY sp.mission_id ORDER BY sp.mission_date
+        """
+        session_health_data = _fetch_dicts(conn, session_health_query)
+
+        trend_query = """
+            SELECT DATE(timestamp) as date, stress_detected, COUNT(*) as count
+            FROM detections WHERE stress_detected != 'Healthy'
+            GROUP BY date, stress_detected ORDER BY date
+        """
+        trend_data = _fetch_dicts(conn, trend_query)
+
+    total_diseased_count = final_agg_data.pop('total_diseased_plants')
+    total_plants = final_agg_data['total_plants_scanned']
     overall_health_index = 100.0
     if total_plants > 0:
-        conn = get_db_connection()
-        total_diseased_plants_query = "SELECT COUNT(DISTINCT mission_id || '-' || plant_number) as count FROM detections WHERE stress_detected != 'Healthy'"
-        total_diseased_count = conn.execute(total_diseased_plants_query).fetchone()['count']
-        conn.close()
         overall_health_index = ((total_plants - total_diseased_count) / total_plants) * 100
 
+    # overall_summary is sorted by count, and total_detections already counts every non-healthy row.
     most_frequent = "N/A"
-    if overall_summary:
-        non_healthy_detections = [s for s in overall_summary if s['stress_detected'] != 'Healthy']
-        if non_healthy_detections:
-            total_disease_count = sum(s['count'] for s in non_healthy_detections)
-            most_frequent_disease = non_healthy_detections[0]
-            most_frequent_perc = (most_frequent_disease['count'] / total_disease_count) * 100
-            most_frequent = f"{most_frequent_disease['stress_detected'].replace('_', ' ')} ({most_frequent_perc:.0f}%)"
-
-    final_agg_data = dict(agg_data) if agg_data else {}
+    most_frequent_disease = next((s for s in overall_summary if s['stress_detected'] != 'Healthy'), None)
+    if most_frequent_disease:
+        most_frequent_perc = (most_frequent_disease['count'] / final_agg_data['total_detections']) * 100
+        most_frequent = f"{most_frequent_disease['stress_detected'].replace('_', ' ')} ({most_frequent_perc:.0f}%)"
+
     final_agg_data['health_index'] = round(overall_health_index, 1)
     final_agg_data['most_frequent_disease'] = most_frequent
 
     return {
         "aggregated_stats": final_agg_data,
-        "overall_detection_summary": [dict(row) for row in overall_summary],
-        "session_health_data": [dict(row) for row in session_health_data],
-        "disease_trend_data": [dict(row) for row in trend_data]
+        "overall_detection_summary": overall_summary,
+        "session_health_data": session_health_data,
+        "disease_trend_data": trend_data
     }
 
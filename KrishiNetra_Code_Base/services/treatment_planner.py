@@ -1,31 +1,43 @@
 # services/treatment_planner.py
 
 import logging
-import sys
-import os
-from typing import Dict, Any, Optional
+import numpy as np
+from typing import Dict, Any, Mapping, Optional
 
-# This allows importing the config file from the project root
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
 
 logger = logging.getLogger(__name__)
 
+
+def _build_class_to_group() -> np.ndarray:
+    """
+    Maps class id -> index into config.TREATMENT_GROUPS, so a plant's detections can be tallied
+    with a single np.bincount. Healthy and unmapped classes land in one extra overflow bin.
+    """
+    class_to_group = np.full(len(config.STRESS_CLASS_NAMES), len(config.TREATMENT_GROUPS), dtype=np.int8)
+    for group_idx, group in enumerate(config.TREATMENT_GROUPS):
+        for stress in group["targets"]:
+            class_to_group[config.STRESS_CLASS_NAMES.index(stress)] = group_idx
+    class_to_group.flags.writeable = False
+    return class_to_group
+
+
 class TreatmentPlanner:
     """
     Implements the logic for creating specific treatment actions based on a
     pre-determined treatment group and environmental sensor data.
     """
 
+    # Lookups depend only on config, so they are built once and shared by every instance.
+    _stress_to_group_map: Mapping[str, Mapping[str, Any]] = config.STRESS_TO_TREATMENT_GROUP
+    _num_groups: int = len(config.TREATMENT_GROUPS)
+    class_to_group: np.ndarray = _build_class_to_group()
+    fertilizer_group_index: int = config.TREATMENT_GROUPS.index(config.FERTILIZER_GROUP)
+
     def __init__(self):
         logger.info("TreatmentPlanner initialized.")
-        # Store groups for quick lookup
-        self._groups = {group['name']: group for group in config.TREATMENT_GROUPS}
-        self._stress_to_group_map = {
-            stress: group for group in config.TREATMENT_GROUPS for stress in group["targets"]
-        }
 
-    def get_group_for_stress(self, stress_name: str) -> Optional[Dict[str, Any]]:
+    def get_group_for_stress(self, stress_name: str) -> Optional[Mapping[str, Any]]:
         """
         A helper method to find the corresponding treatment group for a given stress.
         
@@ -33,18 +45,31 @@ class TreatmentPlanner:
             stress_name (str): The name of the detected stress class.
 
         Returns:
-            Optional[Dict[str, Any]]: The configuration dictionary for the matching
-                                      treatment group, or None if no match is found.
+            Optional[Mapping[str, Any]]: The read-only configuration mapping for the
+                                         matching treatment group, or None if no match is found.
         """
         return self._stress_to_group_map.get(stress_name)
 
-    def create_plan_for_group(self, group: Dict[str, Any], sensor_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def group_histogram(self, class_ids: np.ndarray) -> np.ndarray:
+        """
+        Counts detections per treatment group in one vectorized pass.
+
+        Args:
+            class_ids (np.ndarray): Integer class ids of the detections.
+
+        Returns:
+            np.ndarray: Detection counts indexed like config.TREATMENT_GROUPS.
+        """
+        counts = np.bincount(self.class_to_group[class_ids], minlength=self._num_groups + 1)
+        return counts[:self._num_groups]
+
+    def create_plan_for_group(self, group: Mapping[str, Any], sensor_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Creates a single treatment action based on a pre-selected treatment group
         and adjusts it based on sensor data. Returns None if no treatment is needed.
 
         Args:
-            group (Dict[str, Any]): The configuration dictionary for the treatment group
+            group (Mapping[str, Any]): The configuration mapping for the treatment group
                                     (e.g., config.FERTILIZER_GROUP).
             sensor_data (Dict[str, Any]): The latest sensor readings (T, H).
 
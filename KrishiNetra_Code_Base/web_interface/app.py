@@ -2,16 +2,12 @@
 
 import logging
 import cv2
-import sys
-import os
 import numpy as np
 import threading
 
 from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 from flask_apscheduler import APScheduler
 
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
 import config
 from web_interface.auth import requires_auth
 from core.robot_context import RobotContext, RobotState
@@ -23,6 +19,23 @@ logger = logging.getLogger(__name__)
 robot_controller_instance: RobotController = None
 
 
+def _render_placeholder_jpeg() -> bytes:
+    """Encodes the 'Awaiting Scan' image served before an angle has been scanned."""
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    cv2.putText(frame, "Awaiting Scan",
+                (200, 240), cv2.FONT_HERSHEY_SIMPLEX, 1,
+                (255, 255, 255), 2)
+
+    ok, encoded = cv2.imencode(".jpg", frame)
+    return encoded.tobytes() if ok else b""
+
+
+_VALID_ANGLES = frozenset({"top", "middle", "bottom"})
+
+# The placeholder never changes, so it is encoded once instead of on every poll.
+_PLACEHOLDER_JPEG: bytes = _render_placeholder_jpeg()
+
+
 def create_app(robot_controller: RobotController):
     global robot_controller_instance
     robot_controller_instance = robot_controller
@@ -30,15 +43,27 @@ def create_app(robot_controller: RobotController):
     app = Flask(__name__)
     app.config["robot_context"] = robot_controller.context
 
+    # Compress JSON, HTML, CSS and JS responses (gzip or brotli, as the browser accepts).
+    # Images are already compressed and are left alone.
+    try:
+        from flask_compress import Compress
+        Compress(app)
+    except ImportError:
+        logger.warning("Flask-Compress not installed. Responses will be sent uncompressed.")
+
     # Scheduler
     scheduler = APScheduler()
     scheduler.init_app(app)
     scheduler.start()
 
-    @scheduler.task("interval", id="poll_sensors_task", seconds=2, misfire_grace_time=900)
-    def poll_sensors():
-        """Non-blocking polling thread"""
-        def _poll():
+    # One long-lived worker does the (blocking) serial polls. Scheduler ticks only wake it,
+    # and ticks that arrive while a poll is still running collapse into the next one.
+    poll_requested = threading.Event()
+
+    def _sensor_poll_worker():
+        while True:
+            poll_requested.wait()
+            poll_requested.clear()
             try:
                 if robot_controller_instance and robot_controller_instance.is_initialized:
                     uno = robot_controller_instance.uno_comm.get_sensors()
@@ -52,7 +77,12 @@ def create_app(robot_controller: RobotController):
             except Exception as e:
                 logger.error(f"Sensor polling thread error: {e}")
 
-        threading.Thread(target=_poll).start()
+    threading.Thread(target=_sensor_poll_worker, daemon=True, name="SensorPoll").start()
+
+    @scheduler.task("interval", id="poll_sensors_task", seconds=2, misfire_grace_time=900)
+    def poll_sensors():
+        """Non-blocking: wakes the sensor poll worker"""
+        poll_requested.set()
 
     # ROUTES
     @app.route("/")
@@ -63,32 +93,41 @@ def create_app(robot_controller: RobotController):
     @app.route("/captured_images/<path:filename>")
     @requires_auth
     def get_captured_image(filename):
-        return send_from_directory(config.CAPTURED_IMAGES_DATA_PATH, filename)
+        # Conditional (ETag / If-Modified-Since) and served through wsgi.file_wrapper, so the
+        # file is streamed in chunks rather than read into memory first.
+        response = send_from_directory(
+            config.CAPTURED_IMAGES_DATA_PATH, filename, conditional=True, max_age=config.CAPTURED_IMAGE_MAX_AGE_S
+        )
+        # Behind the login, so only the browser itself may cache it.
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
 
     @app.route("/api/status")
     @requires_auth
     def api_status():
-        return jsonify(app.config["robot_context"].get_all_data_for_ui())
+        return Response(app.config["robot_context"].get_ui_json(), mimetype="application/json")
 
     @app.route("/api/scan_image/<string:angle>")
     @requires_auth
     def api_scan_image(angle: str):
-        if angle not in ["top", "middle", "bottom"]:
+        if angle not in _VALID_ANGLES:
             return "Invalid angle", 404
 
-        frame = app.config["robot_context"].get_scan_image(angle)
-
-        if frame is None:
-            frame = np.zeros((480, 640, 3), dtype=np.uint8)
-            cv2.putText(frame, "Awaiting Scan",
-                        (200, 240), cv2.FONT_HERSHEY_SIMPLEX, 1,
-                        (255, 255, 255), 2)
-
-        ok, encoded = cv2.imencode(".jpg", frame)
-        if not ok:
+        scan = app.config["robot_context"].get_scan_image(angle)
+        if scan is not None:
+            etag, jpeg_bytes = scan
+        elif _PLACEHOLDER_JPEG:
+            etag, jpeg_bytes = "awaiting-scan", _PLACEHOLDER_JPEG
+        else:
             return "Encoding error", 500
 
-        return Response(encoded.tobytes(), mimetype="image/jpeg")
+        # The UI polls this; "no-cache" makes the browser revalidate with If-None-Match,
+        # and an unchanged scan is answered with an empty 304.
+        response = Response(jpeg_bytes, mimetype="image/jpeg")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
 
     @app.route("/api/command", methods=["POST"])
     @requires_auth
@@ -133,8 +172,7 @@ def create_app(robot_controller: RobotController):
         if not data or not data.get("header_stats"):
             return jsonify({"error": "Could not retrieve analytics for the session"}), 404
 
-        data["mission_id"] = prev_id
-        return jsonify(data)
+        return jsonify({**data, "mission_id": prev_id})
 
     @app.route("/api/overall_analytics")
     @requires_auth
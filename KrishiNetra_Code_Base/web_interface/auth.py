@@ -1,13 +1,12 @@
 # web_interface/auth.py
 
+import hmac
 import logging
-from functools import wraps
+from functools import lru_cache, wraps
+from typing import Optional
 from flask import request, Response
-import sys
-import os
+from werkzeug.datastructures import Authorization
 
-# This allows importing the config file from the project root
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
 
 logger = logging.getLogger(__name__)
@@ -15,12 +14,28 @@ logger = logging.getLogger(__name__)
 # --- Authentication credentials ---
 USERNAME = "KrishiNetra"
 PASSWORD = config.WEB_INTERFACE_PASSWORD
+_USERNAME_BYTES = USERNAME.encode("utf-8")
+_PASSWORD_BYTES = PASSWORD.encode("utf-8")
 
 def _check_auth(username, password):
     """
     This function is called to check if a username and password combination is valid.
+    Both fields are always compared in full and in constant time, so response timing
+    does not reveal how much of either one matched.
     """
-    return username == USERNAME and password == PASSWORD
+    username_ok = hmac.compare_digest((username or "").encode("utf-8"), _USERNAME_BYTES)
+    password_ok = hmac.compare_digest((password or "").encode("utf-8"), _PASSWORD_BYTES)
+    return username_ok & password_ok
+
+@lru_cache(maxsize=16)
+def _is_authorized(header: Optional[str]) -> bool:
+    """
+    Decodes a raw Authorization header and checks its credentials.
+    The credentials only change on restart, so the decision is memoized per header value
+    and repeat requests from the same browser skip the base64 decode and comparison.
+    """
+    auth = Authorization.from_header(header)
+    return auth is not None and _check_auth(auth.username, auth.password)
 
 def _authenticate():
     """
@@ -40,8 +55,7 @@ def requires_auth(f):
     """
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth = request.authorization
-        if not auth or not _check_auth(auth.username, auth.password):
+        if not _is_authorized(request.headers.get("Authorization")):
             logger.warning(f"Failed authentication attempt from IP: {request.remote_addr}")
             return _authenticate()
         
@@ -5,6 +5,7 @@ document.addEventListener('DOMContentLoaded', () => {
     let appState = {
         robotStatus: 'OFF',
         missionPlan: {},
+        snapshotEtag: null,
         chartInstances: {},
         allDiseaseClasses: [
             "Fungal_Blight", "Rust_Mildew", "Bacterial_Blight_Spot", "Viral_Curl_Mosaic",
@@ -176,22 +177,28 @@ document.addEventListener('DOMContentLoaded', () => {
                 currentAngle = 'bottom';
         }
 
-     const imageUrl = `/api/scan_image/${currentAngle}?t=${new Date().getTime()}`;
-
     // Fetch the image and only update the src if the image actually exists.
-    // This prevents the "Awaiting Scan" flicker.
-    fetch(imageUrl)
+    // This prevents the "Awaiting Scan" flicker. 'no-cache' revalidates with the ETag,
+    // so an unchanged scan costs an empty 304 and is not re-decoded.
+    fetch(`/api/scan_image/${currentAngle}`, { cache: 'no-cache' })
         .then(response => {
-            if (response.ok) {
-                DOM.snapshotImage.src = imageUrl;
+            if (!response.ok) return; // e.g. 404: the old image (or logo) remains.
+            const etag = response.headers.get('ETag');
+            if (etag && etag === appState.snapshotEtag) return;
+            return response.blob().then(blob => {
+                const previousUrl = DOM.snapshotImage.src;
+                DOM.snapshotImage.src = URL.createObjectURL(blob);
+                if (previousUrl.startsWith('blob:')) URL.revokeObjectURL(previousUrl);
                 DOM.snapshotImage.classList.remove('startup-logo');
-            }
-            // If response is not ok (e.g., 404), do nothing. The old image (or logo) remains.
+                appState.snapshotEtag = etag;
+            });
         });
 
 } else {
     // --- MISSION IS IDLE: SHOW THE LOGO ---
     // Force the image source back to the logo.
+    if (DOM.snapshotImage.src.startsWith('blob:')) URL.revokeObjectURL(DOM.snapshotImage.src);
+    appState.snapshotEtag = null;
     DOM.snapshotImage.src = "/static/images/logo.png";
     DOM.snapshotImage.classList.add('startup-logo');
 }
@@ -236,7 +243,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 <span class="summary-value">${(progress.total_distance_in_row_cm || 0).toFixed(0)} cm</span>
                 
                 <span class="summary-field">Plants Scanned</span>
-                <span class="summary-value">${(data.plant_log || []).length}</span>
+                <span class="summary-value">${progress.plants_scanned ?? (data.plant_log || []).length}</span>
 
                 <span class="summary-field">Plants Treated</span>
                 <span class="summary-value">${progress.plants_treated || 0}</span>